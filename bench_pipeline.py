@@ -0,0 +1,188 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+from pipeline import path_fingerprint
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(PROJECT_DIR, 'benchmarks', 'pipeline_baseline.json')
+
+# Стадии в порядке запуска: функция модуля и папки, которые стадия обрабатывает.
+# check только перечисляет папки и не читает файлы, поэтому для нее считаются лишь время и память
+STAGES = {
+    'convert': ('convert_annotations_server', 'convert_annotations_server',
+                ['VisDrone2019-VID-train', 'VisDrone2019-VID-val']),
+    'prepare': ('prepare_server_dataset', 'create_server_dataset', ['dataset']),
+    'check': ('check_dataset', 'check_dataset', []),
+}
+
+
+def peak_rss_mb():
+    """Пиковая память текущего процесса (ru_maxrss: КБ в Linux, байты в macOS)"""
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if platform.system() == 'Darwin' else rss / 1024
+
+
+def run_child(stage, result_file):
+    """Выполняется в дочернем процессе: запускает стадию и пишет время и пиковую память"""
+    import importlib
+    module_name, func_name, _ = STAGES[stage]
+    func = getattr(importlib.import_module(module_name), func_name)
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    with open(result_file, 'w') as f:
+        json.dump({"seconds": seconds, "peak_rss_mb": peak_rss_mb()}, f)
+
+
+def measure_stage(stage, base_dir, verbose=False):
+    """Запускает стадию в отдельном процессе с BESPILOT_BASE_DIR = base_dir"""
+    _, _, inputs = STAGES[stage]
+    files = 0
+    size = 0
+    for name in inputs:
+        info = path_fingerprint(os.path.join(base_dir, name))
+        files += info["files"]
+        size += info["bytes"]
+
+    result_file = os.path.join(base_dir, f'.bench_{stage}.json')
+    env = dict(os.environ, BESPILOT_BASE_DIR=base_dir)
+    output = None if verbose else subprocess.DEVNULL
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', stage, result_file],
+                            env=env, stdout=output, stderr=output)
+    if result.returncode != 0 or not os.path.exists(result_file):
+        raise RuntimeError(f"стадия {stage} завершилась с кодом {result.returncode}")
+    with open(result_file, 'r') as f:
+        measured = json.load(f)
+    os.remove(result_file)
+
+    seconds = max(measured["seconds"], 1e-9)
+    return {
+        "seconds": round(seconds, 3),
+        "files": files if inputs else None,
+        "mb": round(size / 1024 ** 2, 2) if inputs else None,
+        "files_per_sec": round(files / seconds, 1) if inputs else None,
+        "mb_per_sec": round(size / 1024 ** 2 / seconds, 2) if inputs else None,
+        "peak_rss_mb": round(measured["peak_rss_mb"], 1),
+    }
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """
+    Список регрессий: пропускная способность (для стадий без входных файлов - время)
+    хуже или память выше базовой более чем на tolerance
+    """
+    regressions = []
+    for stage, current in results.items():
+        base = baseline.get(stage)
+        if not base:
+            continue
+        if current["files_per_sec"] is not None and base.get("files_per_sec") is not None:
+            if current["files_per_sec"] < base["files_per_sec"] * (1 - tolerance):
+                regressions.append(f"{stage}: {current['files_per_sec']} файлов/с против {base['files_per_sec']}")
+        elif current["seconds"] > base["seconds"] * (1 + tolerance):
+            regressions.append(f"{stage}: {current['seconds']} с против {base['seconds']}")
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{stage}: пик памяти {current['peak_rss_mb']} МБ против {base['peak_rss_mb']}")
+    return regressions
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['--child']:
+        run_child(argv[1], argv[2])
+        return 0
+
+    parser = argparse.ArgumentParser(description='Бенчмарк convert/prepare/check на синтетических данных VisDrone')
+    parser.add_argument('--train-sequences', type=int, default=4,
+                        help='Последовательностей в train')
+    parser.add_argument('--val-sequences', type=int, default=2,
+                        help='Последовательностей в val')
+    parser.add_argument('--frames', type=int, default=100,
+                        help='Кадров в последовательности')
+    parser.add_argument('--width', type=int, default=1344,
+                        help='Ширина кадра')
+    parser.add_argument('--height', type=int, default=756,
+                        help='Высота кадра')
+    parser.add_argument('--boxes', type=int, default=30,
+                        help='Объектов в кадре')
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE,
+                        help='Файл базовых результатов (JSON)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='Сохранить текущие результаты как базовые')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Допустимое ухудшение относительно базовых результатов (доля)')
+    parser.add_argument('--workdir', type=str, default=None,
+                        help='Папка для данных (по умолчанию временная, удаляется после замера)')
+    parser.add_argument('--verbose', action='store_true',
+                        help='Показывать вывод стадий')
+    args = parser.parse_args(argv)
+
+    print("🚀 === БЕНЧМАРК ПАЙПЛАЙНА ДАННЫХ ===")
+    print("=" * 60)
+
+    config = {key: getattr(args, key) for key in
+              ('train_sequences', 'val_sequences', 'frames', 'width', 'height', 'boxes')}
+    base_dir = args.workdir or tempfile.mkdtemp(prefix='bespilot_bench_')
+    os.makedirs(base_dir, exist_ok=True)
+
+    try:
+        from synth_visdrone import generate_dataset
+        print(f"🧪 Генерация данных: {config}")
+        start = time.time()
+        frames, size = generate_dataset(base_dir, args.train_sequences, args.val_sequences, args.frames,
+                                        args.width, args.height, args.boxes)
+        print(f"✅ {frames} кадров, {size / 1024 ** 2:.1f} МБ за {time.time() - start:.1f} c\n")
+
+        results = {}
+        for stage in STAGES:
+            results[stage] = measure_stage(stage, base_dir, args.verbose)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(base_dir, ignore_errors=True)
+
+    print(f"{'Стадия':<10}{'Секунд':>9}{'Файлов':>9}{'Файлов/с':>11}{'МБ/с':>9}{'Пик RSS, МБ':>13}")
+    print("-" * 61)
+    for stage, r in results.items():
+        if r['files'] is None:
+            print(f"{stage:<10}{r['seconds']:>9.2f}{'—':>9}{'—':>11}{'—':>9}{r['peak_rss_mb']:>13.1f}")
+        else:
+            print(f"{stage:<10}{r['seconds']:>9.2f}{r['files']:>9}{r['files_per_sec']:>11.1f}"
+                  f"{r['mb_per_sec']:>9.1f}{r['peak_rss_mb']:>13.1f}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({"config": config, "machine": platform.node(), "stages": results}, f, indent=2)
+        print(f"\n💾 Базовые результаты сохранены: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("\n💡 Базовых результатов нет, сохраните их: python bench_pipeline.py --update-baseline")
+        return 0
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config:
+        print(f"\n⚠️  Масштаб данных отличается от базового ({baseline.get('config')}), сравнение приблизительное")
+
+    regressions = compare_with_baseline(results, baseline.get("stages", {}), args.tolerance)
+    if regressions:
+        print(f"\n❌ Регрессии (допуск {args.tolerance:.0%}):")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+
+    print(f"\n✅ Без регрессий относительно {args.baseline} (допуск {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
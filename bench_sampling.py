@@ -0,0 +1,94 @@
+import os
+import sys
+import csv
+import time
+import shutil
+import argparse
+import subprocess
+
+from config import get_base_dir
+
+# Сравниваемые режимы выборки: имя -> аргументы train_server.py
+MODES = {
+    'uniform': ['--sampling', 'uniform'],
+    'balanced': ['--sampling', 'balanced'],
+    'balanced_hard': ['--sampling', 'balanced', '--hard-weight', '1.0'],
+}
+
+
+def read_map_curve(results_csv, metric='metrics/mAP50(B)'):
+    """mAP по эпохам из results.csv ultralytics (в заголовках бывают пробелы)"""
+    if not os.path.exists(results_csv):
+        return []
+    with open(results_csv, 'r') as f:
+        rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    return [float(row[metric]) for row in rows if row.get(metric, '').strip()]
+
+
+def epochs_to_target(curve, target):
+    """Первая эпоха (с 1), на которой mAP достиг цели, или None"""
+    for epoch, value in enumerate(curve, start=1):
+        if value >= target:
+            return epoch
+    return None
+
+
+def main():
+    print("🚀 === БЕНЧМАРК ВЫБОРКИ КАДРОВ: ЭПОХИ ДО ЦЕЛЕВОГО mAP ===")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description='Сравнение равномерной и сбалансированной выборки')
+    parser.add_argument('--target-map', type=float, default=0.25,
+                        help='Целевой mAP50 на валидации')
+    parser.add_argument('--epochs', type=int, default=30,
+                        help='Максимум эпох на режим')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES),
+                        help='Режимы для сравнения')
+    args = parser.parse_args()
+
+    BASE_DIR = get_base_dir()
+    results_dir = os.path.join(BASE_DIR, 'results')
+    train_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'train_server.py')
+
+    rows = []
+    for mode in args.modes:
+        name = f"sampling_{mode}"
+        print(f"\n🎯 Режим: {mode} ({args.epochs} эпох)")
+
+        # С --exist-ok ultralytics дописывает results.csv прошлого запуска - удаляем его целиком
+        shutil.rmtree(os.path.join(results_dir, name), ignore_errors=True)
+        start = time.time()
+        # Без ранней остановки: иначе режим может остановиться раньше, чем дойдет до цели
+        result = subprocess.run([sys.executable, train_script, '--epochs', str(args.epochs),
+                                 '--patience', '0', '--name', name, '--exist-ok'] + MODES[mode])
+        elapsed = time.time() - start
+
+        curve = read_map_curve(os.path.join(results_dir, name, 'results.csv'))
+        reached = epochs_to_target(curve, args.target_map)
+        rows.append({
+            "mode": mode,
+            "epochs_to_target": reached if reached is not None else '',
+            "best_map50": max(curve) if curve else 0.0,
+            "epochs_run": len(curve),
+            "minutes": elapsed / 60,
+            "ok": result.returncode == 0,
+        })
+
+    print("\n📊 Результаты:")
+    print(f"{'Режим':<16}{'Эпох до цели':>14}{'Лучший mAP50':>14}{'Эпох':>8}{'Минут':>8}")
+    print("-" * 60)
+    for row in rows:
+        reached = row['epochs_to_target'] if row['epochs_to_target'] != '' else '—'
+        print(f"{row['mode']:<16}{reached:>14}{row['best_map50']:>14.4f}{row['epochs_run']:>8}{row['minutes']:>8.1f}")
+
+    os.makedirs(results_dir, exist_ok=True)
+    output = os.path.join(results_dir, 'sampling_benchmark.csv')
+    with open(output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"\n💾 Таблица сохранена в: {output}")
+
+
+if __name__ == "__main__":
+    main()
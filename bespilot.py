@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Единая точка входа проекта:
+
+    python bespilot.py check       - проверка структуры данных
+    python bespilot.py convert     - конвертация аннотаций VisDrone в YOLO
+    python bespilot.py prepare     - подготовка data/ и data.yaml
+    python bespilot.py train       - обучение модели
+    python bespilot.py visualize   - визуализация детекций (аргументы validate_and_visualize.py)
+    python bespilot.py pipeline    - все стадии с пропуском актуальных (аргументы pipeline.py)
+    python bespilot.py bench       - замер времени запуска подкоманд
+    python bespilot.py bench pipeline - бенчмарк convert/prepare/check на синтетических данных
+
+Модули подкоманд (и вместе с ними torch/ultralytics/cv2) импортируются только
+при вызове соответствующей подкоманды. Пути задаются через BESPILOT_BASE_DIR или bespilot.ini
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+from config import get_base_dir, get_startup_budget
+
+# Подкоманды, которые замеряются в bench startup, и модули, которые они загружают
+STARTUP_COMMANDS = {
+    'check': 'check_dataset',
+    'convert': 'convert_annotations_server',
+    'prepare': 'prepare_server_dataset',
+    'train': 'train_server',
+    'visualize': 'validate_and_visualize',
+    'pipeline': 'pipeline',
+    'bench': 'bench_pipeline',
+}
+
+
+def run_check(args, extra):
+    from check_dataset import check_dataset
+    check_dataset()
+
+
+def run_convert(args, extra):
+    from convert_annotations_server import convert_annotations_server
+    convert_annotations_server()
+
+
+def run_prepare(args, extra):
+    from prepare_server_dataset import create_server_dataset
+    create_server_dataset()
+
+
+def run_train(args, extra):
+    from train_server import main
+    return main(extra)
+
+
+def run_visualize(args, extra):
+    from validate_and_visualize import main
+    return main(extra)
+
+
+def run_pipeline(args, extra):
+    from pipeline import main
+    return main(extra)
+
+
+def measure_startup(command, repeats):
+    """
+    Медианное время импорта bespilot и модуля подкоманды в отдельном процессе.
+    `<command> --help` не подходит: для части подкоманд справку выводит парсер bespilot,
+    и модуль подкоманды вообще не загружается
+    """
+    code = f"import bespilot, {STARTUP_COMMANDS[command]}"
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', code], cwd=project_dir,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+        if result.returncode != 0:
+            raise RuntimeError(f"не удалось импортировать модуль {command}: "
+                               f"{result.stderr.decode(errors='replace').strip().splitlines()[-1]}")
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def run_bench(args, extra):
+    if args.target == 'pipeline':
+        from bench_pipeline import main
+        return main(extra)
+
+    print("🚀 === ВРЕМЯ ЗАПУСКА ПОДКОМАНД ===")
+    print("=" * 50)
+
+    budget = args.budget if args.budget is not None else get_startup_budget()
+    print(f"⏱️  Бюджет: {budget:.2f} c, повторов: {args.repeats}\n")
+
+    over_budget = []
+    for command in STARTUP_COMMANDS:
+        try:
+            elapsed = measure_startup(command, args.repeats)
+        except RuntimeError as e:
+            over_budget.append(command)
+            print(f"❌ {command:<12}{'ошибка':>8}  {e}")
+            continue
+        ok = elapsed <= budget
+        if not ok:
+            over_budget.append(command)
+        print(f"{'✅' if ok else '❌'} {command:<12}{elapsed * 1000:>8.0f} мс")
+
+    if over_budget:
+        print(f"\n❌ Превышен бюджет запуска: {', '.join(over_budget)}")
+        print("💡 Проверьте, что тяжелые библиотеки импортируются внутри функций, а не на уровне модуля")
+        return 1
+
+    print("\n✅ Все подкоманды укладываются в бюджет")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='bespilot',
+                                     description='Пайплайн обучения YOLO на VisDrone')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('check', help='Проверка структуры данных').set_defaults(func=run_check)
+    subparsers.add_parser('convert', help='Конвертация аннотаций VisDrone в YOLO').set_defaults(func=run_convert)
+    subparsers.add_parser('prepare', help='Подготовка data/ и data.yaml').set_defaults(func=run_prepare)
+
+    # Аргументы train, visualize и pipeline передаются парсерам соответствующих скриптов как есть
+    subparsers.add_parser('train', help='Обучение модели',
+                          add_help=False).set_defaults(func=run_train)
+    subparsers.add_parser('visualize', help='Визуализация детекций',
+                          add_help=False).set_defaults(func=run_visualize)
+    subparsers.add_parser('pipeline', help='Пайплайн check -> convert -> prepare -> train',
+                          add_help=False).set_defaults(func=run_pipeline)
+
+    bench = subparsers.add_parser('bench', help='Замер времени запуска подкоманд')
+    bench.add_argument('target', nargs='?', choices=['startup', 'pipeline'], default='startup',
+                       help='Что замерять: время запуска или пайплайн данных (аргументы bench_pipeline.py)')
+    bench.add_argument('--repeats', type=int, default=5,
+                       help='Число повторов на подкоманду')
+    bench.add_argument('--budget', type=float, default=None,
+                       help='Бюджет времени запуска, секунды (по умолчанию из bespilot.ini или 0.5)')
+    bench.set_defaults(func=run_bench)
+
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+
+    passthrough = args.command in ('train', 'visualize', 'pipeline') or \
+        (args.command == 'bench' and args.target == 'pipeline')
+    if extra and not passthrough:
+        parser.error(f"неизвестные аргументы: {' '.join(extra)}")
+
+    os.environ.setdefault('BESPILOT_BASE_DIR', get_base_dir())
+    return args.func(args, extra) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,14 @@
 import os
 import glob
 
+from config import get_base_dir
+
 
 def check_dataset():
     """
     Проверяет структуру данных на сервере
     """
-    BASE_DIR = os.path.expanduser('~/Bespilot_lopatinBeglov')
+    BASE_DIR = get_base_dir()
 
     print("=== Проверка структуры данных на сервере ===")
     print(f"Базовая директория: {BASE_DIR}")
@@ -102,7 +104,7 @@ def check_dataset():
     print("\n=== Рекомендации ===")
 
     if not os.path.exists(visdrone_ann) or not os.path.exists(visdrone_seq):
-        print("1. Скопируйте папку 'VisDrone2019-VID-train' в ~/Bespilot_lopatinBeglov/")
+        print(f"1. Скопируйте папку 'VisDrone2019-VID-train' в {BASE_DIR}/")
 
     if not os.path.exists(dataset_labels):
         print("2. Запустите: python convert_annotations_server.py")
@@ -0,0 +1,60 @@
+import os
+import configparser
+
+# Только стандартная библиотека: модуль импортируется при каждом запуске CLI
+
+DEFAULT_BASE_DIR = '~/Bespilot_lopatinBeglov'
+DEFAULT_STARTUP_BUDGET = 0.5  # секунды на запуск подкоманды (--help)
+
+CONFIG_FILENAME = 'bespilot.ini'
+
+_config = None
+
+
+def config_paths():
+    """
+    Где искать файл конфигурации (по порядку):
+    $BESPILOT_CONFIG, ./bespilot.ini, папка проекта, ~/.config/bespilot.ini
+    """
+    paths = []
+    if os.environ.get('BESPILOT_CONFIG'):
+        paths.append(os.path.expanduser(os.environ['BESPILOT_CONFIG']))
+    paths.append(os.path.join(os.getcwd(), CONFIG_FILENAME))
+    paths.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), CONFIG_FILENAME))
+    paths.append(os.path.expanduser(os.path.join('~', '.config', CONFIG_FILENAME)))
+    return paths
+
+
+def load_config():
+    """
+    Читает первый найденный bespilot.ini, например:
+
+    [paths]
+    base_dir = /data/Bespilot_lopatinBeglov
+
+    [bench]
+    startup_budget = 0.5
+    """
+    global _config
+    if _config is None:
+        _config = configparser.ConfigParser()
+        for path in config_paths():
+            if os.path.isfile(path):
+                _config.read(path)
+                break
+    return _config
+
+
+def get_base_dir():
+    """
+    Базовая директория проекта: $BESPILOT_BASE_DIR, затем [paths] base_dir из bespilot.ini,
+    иначе ~/Bespilot_lopatinBeglov
+    """
+    base_dir = os.environ.get('BESPILOT_BASE_DIR') or load_config().get('paths', 'base_dir',
+                                                                        fallback=DEFAULT_BASE_DIR)
+    return os.path.abspath(os.path.expanduser(base_dir))
+
+
+def get_startup_budget():
+    """Допустимое время запуска подкоманды CLI, секунды"""
+    return load_config().getfloat('bench', 'startup_budget', fallback=DEFAULT_STARTUP_BUDGET)
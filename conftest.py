@@ -0,0 +1,2 @@
+# Модули проекта лежат в корне репозитория: pytest добавляет папку этого conftest.py в sys.path,
+# поэтому тесты в tests/ импортируют их напрямую
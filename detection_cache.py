@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import zipfile
+import hashlib
+import numpy as np
+
+
+# Порог уверенности, с которым детекции сохраняются в кэш.
+# Любой более высокий порог потом применяется фильтрацией без инференса
+DEFAULT_CONF_FLOOR = 0.01
+
+# Временные .npz.tmp старше этого возраста считаются остатками прерванной записи
+STALE_TMP_SECONDS = 3600
+
+_model_hashes = {}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """SHA-256 файла весов модели (запоминается по пути, размеру и mtime)"""
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _model_hashes:
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                h.update(chunk)
+        _model_hashes[memo_key] = h.hexdigest()
+    return _model_hashes[memo_key]
+
+
+def cache_key(model_hash, frame_paths, settings):
+    """
+    Ключ кэша: хэш весов модели, пути/размеры/mtime кадров и настройки инференса
+    """
+    h = hashlib.sha256()
+    h.update(model_hash.encode('utf-8'))
+    h.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    for path in frame_paths:
+        st = os.stat(path)
+        h.update(f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}\n".encode('utf-8'))
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """
+    Кэш детекций: один сжатый .npz на последовательность.
+    Размер ограничен max_size_mb, при превышении удаляются давно не использованные файлы (LRU по mtime)
+    """
+
+    def __init__(self, cache_dir, max_size_mb=2048):
+        self.cache_dir = cache_dir
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def load(self, key):
+        """Возвращает словарь массивов или None, если записи нет"""
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                entry = {k: data[k] for k in data.files}
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Поврежденная или обрезанная запись - считаем промахом
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # Обновляем время использования для LRU
+        os.utime(path)
+        return entry
+
+    def save(self, key, frames, frame_idx, boxes, conf, cls, names, sequence=''):
+        """
+        Сохраняет детекции последовательности.
+        frames - имена кадров, frame_idx - индекс кадра для каждой детекции
+        """
+        path = self.path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                frames=np.asarray(frames),
+                frame_idx=np.asarray(frame_idx, dtype=np.int32),
+                boxes=np.asarray(boxes, dtype=np.float32).reshape(-1, 4),
+                conf=np.asarray(conf, dtype=np.float32),
+                cls=np.asarray(cls, dtype=np.int16),
+                names=np.asarray(json.dumps(names, ensure_ascii=False)),
+                sequence=np.asarray(sequence)
+            )
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """
+        Удаляет самые старые записи (кроме keep), пока кэш не уложится в лимит.
+        Брошенные .npz.tmp удаляются, свежие (запись идет сейчас) учитываются в размере
+        """
+        entries = []
+        total = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+                if name.endswith('.npz.tmp'):
+                    if now - st.st_mtime > STALE_TMP_SECONDS:
+                        os.remove(path)
+                    else:
+                        total += st.st_size
+                    continue
+            except OSError:
+                # Файл удален параллельной записью или очисткой
+                continue
+            if not name.endswith('.npz'):
+                continue
+            total += st.st_size
+            if path != keep:
+                entries.append((st.st_mtime, st.st_size, path))
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def load_cache_file(path):
+    """Читает файл кэша напрямую (для метрик и подбора порогов)"""
+    with np.load(path, allow_pickle=False) as data:
+        return {k: data[k] for k in data.files}
+
+
+def cached_names(entry):
+    """Словарь имен классов, сохраненный вместе с детекциями"""
+    return {int(k): v for k, v in json.loads(str(entry['names'])).items()}
+
+
+def frame_detections(entry, conf_threshold):
+    """
+    Разбивает кэш на детекции по кадрам с фильтрацией по порогу уверенности.
+    Возвращает список (boxes, conf, cls) длиной len(frames)
+    """
+    keep = entry['conf'] >= conf_threshold
+    frame_idx = entry['frame_idx'][keep]
+    order = np.argsort(frame_idx, kind='stable')
+    frame_idx = frame_idx[order]
+    boxes, conf, cls = entry['boxes'][keep][order], entry['conf'][keep][order], entry['cls'][keep][order]
+
+    bounds = np.searchsorted(frame_idx, np.arange(len(entry['frames']) + 1))
+    return [(boxes[a:b], conf[a:b], cls[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def to_visdrone(entry, conf_threshold=0.0):
+    """
+    Переводит кэш в массив формата VisDrone (N, 8) для evaluate_detections.py.
+    Классы YOLO 0..9 -> категории VisDrone 1..10
+    """
+    keep = entry['conf'] >= conf_threshold
+    frames = np.array([int(os.path.splitext(str(f))[0]) for f in entry['frames']], dtype=np.float64)
+    boxes = entry['boxes'][keep].astype(np.float64)
+
+    out = np.zeros((int(keep.sum()), 8), dtype=np.float64)
+    out[:, 0] = frames[entry['frame_idx'][keep]]
+    out[:, 1] = -1
+    out[:, 2:4] = boxes[:, 0:2]
+    out[:, 4:6] = boxes[:, 2:4] - boxes[:, 0:2]
+    out[:, 6] = entry['conf'][keep]
+    out[:, 7] = entry['cls'][keep].astype(np.float64) + 1
+    return out
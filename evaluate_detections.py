@@ -0,0 +1,367 @@
+import os
+import json
+import argparse
+import numpy as np
+
+from config import get_base_dir
+from detection_cache import load_cache_file, to_visdrone
+
+
+# Категории VisDrone: 0 - игнорируемые области, 1..10 - объекты, 11 - прочее
+VISDRONE_IGNORED = 0
+VISDRONE_OTHERS = 11
+VISDRONE_NAMES = ["pedestrian", "person", "bicycle", "car", "van", "truck", "tricycle", "awning-tricycle", "bus",
+                  "motor"]
+
+# Пороги IoU как в COCO: 0.50:0.05:0.95
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def load_visdrone_file(path):
+    """
+    Читает файл в формате VisDrone-VID (аннотации или сохраненные предсказания)
+    и возвращает массив (N, 8):
+    frame_index, target_id, x, y, w, h, score, category
+    """
+    rows = []
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.strip().rstrip(',').split(',')
+            if len(parts) < 8:
+                continue
+            try:
+                rows.append([float(p) for p in parts[:8]])
+            except ValueError:
+                continue
+
+    if not rows:
+        return np.zeros((0, 8), dtype=np.float64)
+    return np.asarray(rows, dtype=np.float64)
+
+
+def xywh_to_xyxy(boxes):
+    """Переводит боксы из (x, y, w, h) в (x1, y1, x2, y2)"""
+    out = boxes.copy()
+    out[:, 2:4] += out[:, 0:2]
+    return out
+
+
+def box_iou(boxes1, boxes2):
+    """
+    Матрица IoU (N, M) для боксов в формате xyxy, считается одной операцией NumPy
+    """
+    area1 = (boxes1[:, 2] - boxes1[:, 0]) * (boxes1[:, 3] - boxes1[:, 1])
+    area2 = (boxes2[:, 2] - boxes2[:, 0]) * (boxes2[:, 3] - boxes2[:, 1])
+
+    lt = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    rb = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+
+    union = area1[:, None] + area2[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def box_ioa(boxes, regions):
+    """
+    Доля площади каждого бокса, попадающая в игнорируемые области (N, M)
+    """
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    lt = np.maximum(boxes[:, None, :2], regions[None, :, :2])
+    rb = np.minimum(boxes[:, None, 2:], regions[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(axis=2)
+
+    return inter / np.maximum(area[:, None], 1e-9)
+
+
+def split_ignored(gt):
+    """
+    Разделяет разметку на объекты для оценки и игнорируемые области.
+    Игнорируются категории 0 (ignored regions), 11 (others) и записи с score = 0
+    """
+    cls = gt[:, 7].astype(np.int64)
+    ignore_mask = (cls == VISDRONE_IGNORED) | (cls == VISDRONE_OTHERS) | (gt[:, 6] == 0)
+    return gt[~ignore_mask], gt[ignore_mask]
+
+
+def drop_in_ignored(boxes_xyxy, regions_xyxy, thr=0.5):
+    """
+    Маска боксов, которые НЕ лежат в игнорируемых областях (IoA <= thr)
+    """
+    if len(boxes_xyxy) == 0 or len(regions_xyxy) == 0:
+        return np.ones(len(boxes_xyxy), dtype=bool)
+    return box_ioa(boxes_xyxy, regions_xyxy).max(axis=1) <= thr
+
+
+def match_detections(pred_cls, gt_cls, iou, iou_thresholds=IOU_THRESHOLDS):
+    """
+    Сопоставляет детекции с разметкой сразу для всех порогов IoU, как в COCO.
+    Детекции должны идти по убыванию уверенности (так их упорядочивает evaluate_frame).
+    Возвращает булев массив TP формы (N_pred, N_thresholds)
+    """
+    tp = np.zeros((len(pred_cls), len(iou_thresholds)), dtype=bool)
+    if len(pred_cls) == 0 or len(gt_cls) == 0:
+        return tp
+
+    # Учитываем только пары с совпадающим классом
+    iou = iou * (pred_cls[:, None] == gt_cls[None, :])
+    thresholds = np.asarray(iou_thresholds)[:, None]
+    rows = np.arange(len(thresholds))
+
+    # Каждая детекция по очереди забирает лучший еще не занятый объект с IoU >= thr,
+    # поэтому при занятом лучшем объекте она может сопоставиться со следующим.
+    # Занятые объекты хранятся отдельно для каждого порога: (N_thresholds, N_gt)
+    matched = np.zeros((len(thresholds), len(gt_cls)), dtype=bool)
+    for p in np.nonzero(iou.max(axis=1) >= thresholds.min())[0]:
+        candidates = np.where(matched, -1.0, iou[p])
+        g = candidates.argmax(axis=1)
+        hit = candidates[rows, g] >= thresholds[:, 0]
+        matched[rows[hit], g[hit]] = True
+        tp[p] = hit
+
+    return tp
+
+
+def evaluate_frame(pred, gt, max_dets=500, ignore_ioa=0.5):
+    """
+    Оценивает один кадр. pred и gt - массивы в формате load_visdrone_file.
+    Возвращает (tp, conf, pred_cls, target_cls)
+    """
+    gt, ignored = split_ignored(gt)
+    ignored_xyxy = xywh_to_xyxy(ignored[:, 2:6])
+
+    # Объекты разметки внутри игнорируемых областей не учитываются
+    gt_xyxy = xywh_to_xyxy(gt[:, 2:6])
+    keep = drop_in_ignored(gt_xyxy, ignored_xyxy, ignore_ioa)
+    gt, gt_xyxy = gt[keep], gt_xyxy[keep]
+
+    # Предсказания: только валидные категории, по убыванию уверенности, не больше max_dets
+    pred = pred[(pred[:, 7] >= 1) & (pred[:, 7] <= len(VISDRONE_NAMES))]
+    pred = pred[np.argsort(-pred[:, 6], kind='stable')[:max_dets]]
+    pred_xyxy = xywh_to_xyxy(pred[:, 2:6])
+
+    # Детекции в игнорируемых областях выбрасываются, а не считаются ложными
+    keep = drop_in_ignored(pred_xyxy, ignored_xyxy, ignore_ioa)
+    pred, pred_xyxy = pred[keep], pred_xyxy[keep]
+
+    pred_cls = pred[:, 7].astype(np.int64)
+    gt_cls = gt[:, 7].astype(np.int64)
+
+    if len(pred) and len(gt):
+        iou = box_iou(pred_xyxy, gt_xyxy)
+    else:
+        iou = np.zeros((len(pred), len(gt)))
+
+    tp = match_detections(pred_cls, gt_cls, iou)
+    return tp, pred[:, 6], pred_cls, gt_cls
+
+
+def group_by_frame(data):
+    """
+    Разбивает массив на словарь {frame_index: строки кадра} без цикла по строкам
+    """
+    if len(data) == 0:
+        return {}
+    data = data[np.argsort(data[:, 0], kind='stable')]
+    frames, starts = np.unique(data[:, 0].astype(np.int64), return_index=True)
+    return dict(zip(frames.tolist(), np.split(data, starts[1:])))
+
+
+def evaluate_sequence(pred, gt, max_dets=500, ignore_ioa=0.5):
+    """
+    Оценивает всю последовательность и возвращает списки статистик по кадрам
+    """
+    pred_frames = group_by_frame(pred)
+    gt_frames = group_by_frame(gt)
+    empty = np.zeros((0, 8))
+
+    stats = []
+    for frame_id in sorted(set(pred_frames) | set(gt_frames)):
+        stats.append(evaluate_frame(pred_frames.get(frame_id, empty),
+                                    gt_frames.get(frame_id, empty),
+                                    max_dets, ignore_ioa))
+    return stats
+
+
+def compute_ap(recall, precision):
+    """
+    AP по 101-точечной интерполяции (как в COCO): для каждого порога полноты r
+    берется огибающая точности в первой точке с recall >= r, или 0, если полнота r не достигнута
+    """
+    recall = np.asarray(recall, dtype=np.float64)
+    if len(recall) == 0:
+        return 0.0
+
+    # Огибающая точности
+    mpre = np.flip(np.maximum.accumulate(np.flip(np.asarray(precision, dtype=np.float64))))
+
+    x = np.linspace(0, 1, 101)
+    q = np.searchsorted(recall, x, side='left')
+    reached = q < len(recall)
+    return float(np.where(reached, mpre[np.minimum(q, len(recall) - 1)], 0.0).mean())
+
+
+def ap_per_class(tp, conf, pred_cls, target_cls, num_classes=len(VISDRONE_NAMES)):
+    """
+    Считает AP для каждого класса и порога IoU.
+    Классы нумеруются как в VisDrone: 1..num_classes.
+    Возвращает словарь с массивами ap (num_classes, N_thresholds), precision, recall, n_gt
+    """
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+
+    n_thr = tp.shape[1]
+    ap = np.zeros((num_classes, n_thr))
+    precision = np.zeros(num_classes)
+    recall = np.zeros(num_classes)
+    n_gt = np.zeros(num_classes, dtype=np.int64)
+
+    for ci in range(num_classes):
+        cls_id = ci + 1
+        mask = pred_cls == cls_id
+        n_l = int((target_cls == cls_id).sum())
+        n_gt[ci] = n_l
+        if n_l == 0 or not mask.any():
+            continue
+
+        # Накопленные TP/FP сразу для всех порогов
+        tpc = tp[mask].cumsum(axis=0)
+        fpc = (1 - tp[mask]).cumsum(axis=0)
+
+        rec = tpc / n_l
+        prec = tpc / (tpc + fpc)
+
+        for j in range(n_thr):
+            ap[ci, j] = compute_ap(rec[:, j], prec[:, j])
+
+        # Точность и полнота при IoU=0.5 на последней детекции
+        precision[ci] = prec[-1, 0]
+        recall[ci] = rec[-1, 0]
+
+    return {"ap": ap, "precision": precision, "recall": recall, "n_gt": n_gt}
+
+
+def evaluate(pred_by_seq, gt_by_seq, max_dets=500, ignore_ioa=0.5):
+    """
+    Оценивает набор последовательностей.
+    pred_by_seq и gt_by_seq - словари {sequence: массив в формате load_visdrone_file}
+    """
+    stats = []
+    for seq, gt in gt_by_seq.items():
+        pred = pred_by_seq.get(seq, np.zeros((0, 8)))
+        stats.extend(evaluate_sequence(pred, gt, max_dets, ignore_ioa))
+
+    if not stats:
+        tp = np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+        conf, pred_cls, target_cls = np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    else:
+        tp, conf, pred_cls, target_cls = (np.concatenate(x, axis=0) for x in zip(*stats))
+
+    res = ap_per_class(tp, conf, pred_cls, target_cls)
+    present = res["n_gt"] > 0
+
+    return {
+        "classes": {
+            name: {
+                "n_gt": int(res["n_gt"][i]),
+                "precision": float(res["precision"][i]),
+                "recall": float(res["recall"][i]),
+                "AP50": float(res["ap"][i, 0]),
+                "AP50-95": float(res["ap"][i].mean()),
+            }
+            for i, name in enumerate(VISDRONE_NAMES)
+        },
+        "mAP50": float(res["ap"][present, 0].mean()) if present.any() else 0.0,
+        "mAP50-95": float(res["ap"][present].mean()) if present.any() else 0.0,
+        "frames": len(stats),
+    }
+
+
+def load_directory(dir_path):
+    """Загружает все .txt файлы директории в словарь {sequence: массив}"""
+    data = {}
+    for name in sorted(os.listdir(dir_path)):
+        if name.endswith('.txt'):
+            data[os.path.splitext(name)[0]] = load_visdrone_file(os.path.join(dir_path, name))
+    return data
+
+
+def print_metrics(metrics):
+    """Печатает таблицу метрик по классам"""
+    print(f"{'Класс':<18}{'GT':>8}{'P':>8}{'R':>8}{'AP50':>8}{'AP50-95':>10}")
+    print("-" * 60)
+    for name, m in metrics["classes"].items():
+        print(f"{name:<18}{m['n_gt']:>8}{m['precision']:>8.3f}{m['recall']:>8.3f}"
+              f"{m['AP50']:>8.3f}{m['AP50-95']:>10.3f}")
+    print("-" * 60)
+    print(f"🎯 mAP50: {metrics['mAP50']:.4f}")
+    print(f"🎯 mAP50-95: {metrics['mAP50-95']:.4f}")
+
+
+def main(argv=None):
+    print("🚀 === ОЦЕНКА ДЕТЕКЦИЙ НА РАЗМЕТКЕ VISDRONE ===")
+    print("=" * 60)
+
+    BASE_DIR = get_base_dir()
+
+    parser = argparse.ArgumentParser(description='Подсчет метрик детекции по сохраненным предсказаниям')
+    parser.add_argument('--pred-dir', type=str, default=None,
+                        help='Папка с предсказаниями в формате VisDrone (по одному .txt на последовательность)')
+    parser.add_argument('--cache-files', type=str, nargs='+', default=[],
+                        help='Файлы кэша детекций (.npz из validate_and_visualize.py) вместо --pred-dir')
+    parser.add_argument('--conf', type=float, default=0.0,
+                        help='Минимальная уверенность предсказаний')
+    parser.add_argument('--gt-dir', type=str,
+                        default=os.path.join(BASE_DIR, 'VisDrone2019-VID-val', 'annotations'),
+                        help='Папка с аннотациями VisDrone')
+    parser.add_argument('--max-dets', type=int, default=500,
+                        help='Максимум детекций на кадр')
+    parser.add_argument('--ignore-ioa', type=float, default=0.5,
+                        help='Доля площади бокса в игнорируемой области, после которой он исключается')
+    parser.add_argument('--output', type=str, default=os.path.join(BASE_DIR, 'results', 'metrics.json'),
+                        help='Куда сохранить метрики в JSON')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.gt_dir):
+        print(f"❌ Ошибка: директория аннотаций не найдена: {args.gt_dir}")
+        return
+    if not args.pred_dir and not args.cache_files:
+        print("❌ Ошибка: укажите --pred-dir или --cache-files")
+        return
+    if args.pred_dir and not os.path.exists(args.pred_dir):
+        print(f"❌ Ошибка: директория предсказаний не найдена: {args.pred_dir}")
+        return
+
+    print(f"📁 Аннотации: {args.gt_dir}")
+
+    gt_by_seq = load_directory(args.gt_dir)
+    pred_by_seq = {}
+    if args.pred_dir:
+        print(f"📁 Предсказания: {args.pred_dir}")
+        pred_by_seq.update(load_directory(args.pred_dir))
+    for cache_file in args.cache_files:
+        # Кэш хранит детекции с низким порогом - метрики считаются без инференса
+        entry = load_cache_file(cache_file)
+        pred_by_seq[str(entry['sequence'])] = to_visdrone(entry)
+        print(f"⚡ Кэш детекций: {cache_file} ({entry['sequence']})")
+
+    pred_by_seq = {seq: pred[pred[:, 6] >= args.conf] for seq, pred in pred_by_seq.items()}
+
+    missing = sorted(set(gt_by_seq) - set(pred_by_seq))
+    if missing:
+        print(f"⚠️  Нет предсказаний для {len(missing)} последовательностей, они считаются пустыми")
+
+    metrics = evaluate(pred_by_seq, gt_by_seq, args.max_dets, args.ignore_ioa)
+    metrics["sequences"] = len(gt_by_seq)
+
+    print(f"\n📊 Оценено кадров: {metrics['frames']} в {len(gt_by_seq)} последовательностях\n")
+    print_metrics(metrics)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Метрики сохранены в: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import os
+import json
+import time
+import queue
+import argparse
+import ipaddress
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import torch
+import numpy as np
+from ultralytics import YOLO
+
+
+class PendingRequest:
+    """Один кадр, ожидающий обработки в батче"""
+
+    def __init__(self, frame, conf):
+        self.frame = frame
+        self.conf = conf
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DynamicBatcher:
+    """
+    Собирает параллельные запросы в батчи: батч отправляется в модель,
+    когда набрано max_batch кадров или истек max_wait_ms с момента первого кадра
+    """
+
+    def __init__(self, model, device, imgsz=640, max_batch=8, max_wait_ms=10):
+        self.model = model
+        self.device = device
+        self.imgsz = imgsz
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = queue.Queue()
+        self.stats = {"batches": 0, "frames": 0}
+        self.stats_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def submit(self, frame, conf, timeout=30.0):
+        """Ставит кадр в очередь и ждет результат"""
+        request = PendingRequest(frame, conf)
+        self.queue.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError("Превышено время ожидания инференса")
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self):
+        """Ждет первый кадр, затем добирает батч до max_batch или дедлайна"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                # Модель вызывается с минимальным порогом в батче,
+                # затем результаты фильтруются по порогу каждого запроса
+                results = self.model.predict(
+                    source=[r.frame for r in batch],
+                    conf=min(r.conf for r in batch),
+                    imgsz=self.imgsz,
+                    device=self.device,
+                    verbose=False
+                )
+                for request, result in zip(batch, results):
+                    boxes = result.boxes.xyxy.cpu().numpy()
+                    confidences = result.boxes.conf.cpu().numpy()
+                    classes = result.boxes.cls.cpu().numpy()
+                    keep = confidences >= request.conf
+                    request.result = np.column_stack(
+                        (boxes[keep], confidences[keep], classes[keep])
+                    ).tolist()
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+
+            with self.stats_lock:
+                self.stats["batches"] += 1
+                self.stats["frames"] += len(batch)
+
+            for request in batch:
+                request.done.set()
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API:
+      POST /predict  - тело JPEG/PNG (image/*, application/octet-stream)
+                       или JSON {"path": "...", "conf": 0.3}; path - только внутри --path-root
+                       (без --path-root - любой путь, если сервер слушает loopback или Unix-сокет)
+      GET  /health   - состояние и статистика батчинга
+    Ответ /predict: {"boxes": [[x1, y1, x2, y2, conf, cls], ...], "names": {...}}
+    """
+
+    # HTTP/1.1: соединение остается открытым между запросами (Content-Length отправляется всегда)
+    protocol_version = 'HTTP/1.1'
+
+    batcher = None
+    names = {}
+    default_conf = 0.3
+    # Режим "path": None - выключен, '' - любой путь, иначе - только файлы внутри этой папки
+    path_root = None
+
+    def address_string(self):
+        # Для Unix-сокета адрес клиента - пустая строка
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, code, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            with self.batcher.stats_lock:
+                stats = dict(self.batcher.stats)
+            stats["avg_batch"] = stats["frames"] / stats["batches"] if stats["batches"] else 0.0
+            self._send_json(200, {"status": "ok", "stats": stats})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _resolve_path(self, path):
+        """Путь к кадру для режима "path" или None, если он недоступен клиенту"""
+        if self.path_root is None:
+            return None
+        # Относительный путь считается от --path-root
+        real = os.path.realpath(os.path.join(self.path_root, path))
+        if self.path_root and os.path.commonpath([real, self.path_root]) != self.path_root:
+            return None
+        return real
+
+    def do_POST(self):
+        # Тело читается до любого ответа, иначе оно останется в keep-alive соединении
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            # Границу тела не определить: отвечаем и закрываем соединение
+            self.close_connection = True
+            self._send_json(400, {"error": "invalid Content-Length"})
+            return
+        body = self.rfile.read(length)
+
+        if self.path != '/predict':
+            self._send_json(404, {"error": "not found"})
+            return
+
+        content_type = self.headers.get('Content-Type', '')
+        conf = self.default_conf
+
+        if content_type.startswith('application/json'):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self._send_json(400, {"error": "invalid json"})
+                return
+            if not isinstance(payload, dict):
+                self._send_json(400, {"error": "json body must be an object"})
+                return
+            try:
+                conf = float(payload.get('conf', conf))
+            except (TypeError, ValueError):
+                self._send_json(400, {"error": "conf must be a number"})
+                return
+            path = payload.get('path', '')
+            if not isinstance(path, str):
+                self._send_json(400, {"error": "path must be a string"})
+                return
+            path = self._resolve_path(path)
+            if path is None:
+                self._send_json(403, {"error": "path is not allowed"})
+                return
+            frame = cv2.imread(path)
+        elif not body:
+            self._send_json(400, {"error": "empty body"})
+            return
+        else:
+            try:
+                frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+            except cv2.error:
+                frame = None
+
+        if frame is None:
+            self._send_json(400, {"error": "cannot decode image"})
+            return
+
+        try:
+            boxes = self.batcher.submit(frame, conf)
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self._send_json(200, {"boxes": boxes, "names": self.names})
+
+
+def is_loopback(host):
+    """Адрес доступен только с этой машины"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    print("🚀 === СЕРВЕР ИНФЕРЕНСА YOLO ===")
+    print("=" * 50)
+
+    parser = argparse.ArgumentParser(description='Постоянный сервер инференса с динамическим батчингом')
+    parser.add_argument('--model', type=str, default='best.pt',
+                        help='Путь к модели YOLO (.pt или экспортированная модель)')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Адрес HTTP сервера')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Порт HTTP сервера')
+    parser.add_argument('--socket', type=str, default=None,
+                        help='Путь к Unix-сокету (вместо TCP)')
+    parser.add_argument('--max-batch', type=int, default=8,
+                        help='Максимальный размер батча')
+    parser.add_argument('--max-wait-ms', type=float, default=10.0,
+                        help='Максимальное ожидание добора батча, мс')
+    parser.add_argument('--conf', type=float, default=0.3,
+                        help='Порог уверенности по умолчанию')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Размер входа модели')
+    parser.add_argument('--path-root', type=str, default=None,
+                        help='Папка, из которой можно запрашивать кадры по JSON {"path": ...}')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Ошибка: модель не найдена: {args.model}")
+        return
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"🔍 Используемое устройство: {device.upper()}")
+
+    # Модель загружается и прогревается один раз при старте
+    print("\n🤖 Загрузка модели YOLO...")
+    start_time = time.time()
+    model = YOLO(args.model)
+    warmup = np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)
+    model.predict(source=[warmup] * args.max_batch, imgsz=args.imgsz, device=device, verbose=False)
+    print(f"✅ Модель загружена и прогрета за {time.time() - start_time:.1f} c")
+
+    batcher = DynamicBatcher(model, device, args.imgsz, args.max_batch, args.max_wait_ms)
+    batcher.start()
+
+    InferenceHandler.batcher = batcher
+    InferenceHandler.names = {int(k): v for k, v in model.names.items()}
+    InferenceHandler.default_conf = args.conf
+    if args.path_root:
+        InferenceHandler.path_root = os.path.realpath(args.path_root)
+        print(f"📂 Кадры по пути: только из {InferenceHandler.path_root}")
+    elif args.socket or is_loopback(args.host):
+        InferenceHandler.path_root = ''
+    else:
+        print("⚠️  Сервер доступен извне: запросы по пути к файлу отключены (задайте --path-root)")
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = ThreadingUnixHTTPServer(args.socket, InferenceHandler)
+        print(f"\n📡 Сервер слушает Unix-сокет: {args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), InferenceHandler)
+        print(f"\n📡 Сервер слушает: http://{args.host}:{args.port}")
+
+    print(f"📦 Батч: до {args.max_batch} кадров, ожидание до {args.max_wait_ms} мс")
+    print("💡 Для остановки нажмите Ctrl+C")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Остановка сервера...")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Версия формата labels.cache ultralytics (используется, если ultralytics не установлен)
+FALLBACK_CACHE_VERSION = "1.0.3"
+IMG_FORMATS = {"bmp", "dng", "jpeg", "jpg", "mpo", "png", "tif", "tiff", "webp", "pfm"}
+
+SHAPES_FILENAME = 'shapes.json'
+
+
+def cache_version():
+    try:
+        from ultralytics.data.utils import DATASET_CACHE_VERSION
+        return DATASET_CACHE_VERSION
+    except ImportError:
+        return FALLBACK_CACHE_VERSION
+
+
+def get_hash(paths):
+    """Тот же хэш, что ultralytics.data.utils.get_hash: суммарный размер файлов + пути"""
+    try:
+        from ultralytics.data.utils import get_hash as ultralytics_get_hash
+        return ultralytics_get_hash(paths)
+    except ImportError:
+        size = sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+        h = hashlib.sha256(str(size).encode())
+        h.update("".join(paths).encode())
+        return h.hexdigest()
+
+
+def split_files(split_dir):
+    """
+    Пути изображений и меток так, как их строит ultralytics:
+    абсолютные пути images/*, метки - та же структура в labels/ с расширением .txt
+    """
+    images_dir = os.path.realpath(os.path.join(split_dir, 'images'))
+    im_files = sorted(os.path.join(images_dir, f) for f in os.listdir(images_dir)
+                      if f.rsplit('.', 1)[-1].lower() in IMG_FORMATS)
+    sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    label_files = [sb.join(x.rsplit(sa, 1)).rsplit('.', 1)[0] + '.txt' for x in im_files]
+    return im_files, label_files
+
+
+def cache_path(split_dir):
+    """labels.cache рядом с папкой labels, как его ищет ultralytics"""
+    return os.path.join(os.path.realpath(split_dir), 'labels.cache')
+
+
+def parse_label_text(text):
+    """YOLO-разметка кадра в массив (N, 5): cls, x, y, w, h"""
+    rows = [line.split() for line in text.splitlines() if line.strip()]
+    if not rows:
+        return np.zeros((0, 5), dtype=np.float32)
+    lb = np.array(rows, dtype=np.float32)
+    # Удаляем дубликаты, как это делает ultralytics
+    _, idx = np.unique(lb, axis=0, return_index=True)
+    return lb[np.sort(idx)]
+
+
+def read_image_shape(im_file):
+    """(h, w) по заголовку изображения, без декодирования"""
+    from PIL import Image
+    with Image.open(im_file) as img:
+        w, h = img.size
+    return h, w
+
+
+def load_shapes(labels_dir):
+    """Размеры кадров, сохраненные конвертером: {video: {frame.jpg: [w, h]}}"""
+    path = os.path.join(labels_dir, SHAPES_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def make_entry(im_file, shape, lb):
+    return {
+        "im_file": im_file,
+        "shape": shape,
+        "cls": lb[:, 0:1],
+        "bboxes": lb[:, 1:],
+        "segments": [],
+        "keypoints": None,
+        "normalized": True,
+        "bbox_format": "xywh",
+    }
+
+
+def build_label_cache(split_dir, known=None, workers=16):
+    """
+    Пишет labels.cache для data/<split> без сканирования ultralytics.
+    known - {im_file: (shape_hw, lb)} для кадров, уже разобранных при подготовке
+    (lb = None, если у кадра нет файла разметки);
+    остальные кадры читаются параллельно (заголовок изображения + .txt)
+    """
+    known = known or {}
+    im_files, label_files = split_files(split_dir)
+
+    def load(item):
+        im_file, label_file = item
+        if im_file in known:
+            shape, lb = known[im_file]
+            if lb is None:
+                return im_file, shape, np.zeros((0, 5), dtype=np.float32), False
+            return im_file, shape, lb, True
+        shape = read_image_shape(im_file)
+        if not os.path.exists(label_file):
+            return im_file, shape, np.zeros((0, 5), dtype=np.float32), False
+        with open(label_file, 'r') as f:
+            return im_file, shape, parse_label_text(f.read()), True
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        loaded = list(pool.map(load, zip(im_files, label_files)))
+
+    labels = []
+    nf = nm = ne = 0
+    for im_file, shape, lb, found in loaded:
+        if not found:
+            nm += 1
+        elif len(lb) == 0:
+            ne += 1
+        else:
+            nf += 1
+        labels.append(make_entry(im_file, tuple(int(v) for v in shape), lb))
+
+    x = {
+        "labels": labels,
+        "hash": get_hash(label_files + im_files),
+        "results": (nf, nm, ne, 0, len(im_files)),
+        "msgs": [],
+        "version": cache_version(),
+    }
+
+    path = cache_path(split_dir)
+    if os.path.exists(path):
+        os.remove(path)
+    np.save(path, x)  # numpy добавляет .npy
+    os.replace(f"{path}.npy", path)
+    return path, x["results"]
+
+
+def label_cache_is_fresh(split_dir):
+    """Проверяет, что labels.cache соответствует текущим файлам (те же правила, что у ultralytics)"""
+    path = cache_path(split_dir)
+    if not os.path.exists(path):
+        return False
+    try:
+        cache = np.load(path, allow_pickle=True).item()
+    except Exception:
+        return False
+    im_files, label_files = split_files(split_dir)
+    return cache.get("version") == cache_version() and cache.get("hash") == get_hash(label_files + im_files)
+
+
+def ensure_label_cache(split_dir):
+    """Перестраивает labels.cache, если его нет или он устарел. Возвращает True, если кэш был перестроен"""
+    if label_cache_is_fresh(split_dir):
+        return False
+    build_label_cache(split_dir)
+    return True
@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import socket
+import argparse
+import http.client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP соединение через Unix-сокет"""
+
+    def __init__(self, socket_path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def percentile(values, q):
+    """Перцентиль без numpy (линейная интерполяция)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+
+def main():
+    print("🚀 === НАГРУЗОЧНЫЙ ТЕСТ СЕРВЕРА ИНФЕРЕНСА ===")
+    print("=" * 50)
+
+    parser = argparse.ArgumentParser(description='Нагрузочный тест inference_server.py')
+    parser.add_argument('--images', type=str, required=True,
+                        help='Папка с кадрами .jpg (например последовательность VisDrone)')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Адрес HTTP сервера')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Порт HTTP сервера')
+    parser.add_argument('--socket', type=str, default=None,
+                        help='Путь к Unix-сокету сервера')
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Общее число запросов')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Число параллельных клиентов')
+    parser.add_argument('--mode', choices=['bytes', 'path'], default='bytes',
+                        help='Отправлять JPEG в теле запроса или только путь к файлу')
+    parser.add_argument('--conf', type=float, default=0.3,
+                        help='Порог уверенности (для режима path)')
+    args = parser.parse_args()
+
+    images = sorted(os.path.join(args.images, f) for f in os.listdir(args.images) if f.endswith('.jpg'))
+    if not images:
+        print(f"❌ Ошибка: нет изображений в {args.images}")
+        return
+
+    # Кадры читаются заранее, чтобы диск не влиял на замер
+    if args.mode == 'bytes':
+        payloads = []
+        for path in images[:args.requests]:
+            with open(path, 'rb') as f:
+                payloads.append((f.read(), 'image/jpeg'))
+    else:
+        payloads = [(json.dumps({"path": os.path.abspath(p), "conf": args.conf}).encode('utf-8'),
+                     'application/json') for p in images[:args.requests]]
+
+    local = threading.local()
+
+    def get_connection():
+        # Одно keep-alive соединение на поток клиента
+        if not hasattr(local, 'conn'):
+            if args.socket:
+                local.conn = UnixHTTPConnection(args.socket)
+            else:
+                local.conn = http.client.HTTPConnection(args.host, args.port, timeout=60)
+        return local.conn
+
+    def send(i):
+        body, content_type = payloads[i % len(payloads)]
+        conn = get_connection()
+        start = time.perf_counter()
+        conn.request('POST', '/predict', body=body, headers={'Content-Type': content_type})
+        response = conn.getresponse()
+        response.read()
+        return time.perf_counter() - start, response.status
+
+    print(f"📁 Кадров: {len(payloads)} ({args.mode})")
+    print(f"📊 Запросов: {args.requests}, параллельно: {args.concurrency}")
+
+    latencies = []
+    errors = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for latency, status in pool.map(send, range(args.requests)):
+            if status == 200:
+                latencies.append(latency)
+            else:
+                errors += 1
+    total_time = time.perf_counter() - start_time
+
+    print("\n📈 Результаты:")
+    print("-" * 30)
+    print(f"✅ Успешных запросов: {len(latencies)}")
+    print(f"❌ Ошибок: {errors}")
+    print(f"⏱️  Общее время: {total_time:.2f} c")
+    print(f"🚀 Пропускная способность: {len(latencies) / total_time:.1f} кадров/с")
+    print(f"📊 Задержка p50: {percentile(latencies, 50) * 1000:.1f} мс")
+    print(f"📊 Задержка p99: {percentile(latencies, 99) * 1000:.1f} мс")
+    if latencies:
+        print(f"📊 Задержка средняя: {sum(latencies) / len(latencies) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from config import get_base_dir
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+SPLITS = ['train', 'val']
+STAGE_GROUPS = ['check', 'convert', 'prepare', 'train']
+
+
+def path_fingerprint(path):
+    """
+    Отпечаток файла или папки по списку файлов (относительный путь, размер, mtime).
+    Содержимое не читается, поэтому папки с десятками тысяч кадров проверяются быстро
+    """
+    h = hashlib.sha256()
+    files = 0
+    size = 0
+    if os.path.isfile(path):
+        entries = [('', path)]
+    elif os.path.isdir(path):
+        entries = []
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            for name in sorted(names):
+                full = os.path.join(root, name)
+                entries.append((os.path.relpath(full, path), full))
+    else:
+        return {"hash": None, "files": 0, "bytes": 0}
+
+    for rel, full in entries:
+        st = os.stat(full)
+        h.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        files += 1
+        size += st.st_size
+    return {"hash": h.hexdigest(), "files": files, "bytes": size}
+
+
+def code_fingerprint(modules):
+    """Хэш исходного кода модулей стадии: изменение кода тоже делает результат устаревшим"""
+    h = hashlib.sha256()
+    for module in sorted(modules):
+        with open(os.path.join(PROJECT_DIR, module), 'rb') as f:
+            h.update(module.encode() + b'\0' + f.read())
+    return h.hexdigest()
+
+
+class Stage:
+    """
+    Стадия пайплайна: функция, входы/выходы (пути), зависимости, параметры и код.
+    always=True - стадия без выходов, выполняется при каждом запуске (проверки)
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), deps=(), params=None, code=(), always=False):
+        self.name = name
+        self.group = name.split(':')[0]
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.params = params or {}
+        self.code = list(code)
+        self.always = always
+
+    def fingerprint(self):
+        """Возвращает (отпечаток стадии, отпечатки входов)"""
+        inputs = {path: path_fingerprint(path)["hash"] for path in self.inputs}
+        payload = {"inputs": inputs, "params": self.params, "code": code_fingerprint(self.code)}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest(), inputs
+
+
+class PipelineRunner:
+    """
+    Выполняет стадии в порядке зависимостей; независимые стадии (train и val) - параллельно.
+    Стадия пропускается, если отпечаток входов/параметров/кода совпадает с прошлым
+    успешным запуском и ее выходы не менялись с тех пор
+    """
+
+    def __init__(self, stages, runs_dir, workers=2, force=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.workers = workers
+        self.force = force
+        self.run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+        self.state_path = os.path.join(runs_dir, 'pipeline_state.json')
+        self.log_path = os.path.join(runs_dir, 'pipeline_runs.jsonl')
+        self.lock = threading.Lock()
+        os.makedirs(runs_dir, exist_ok=True)
+
+        self.state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                self.state = json.load(f)
+
+    def is_up_to_date(self, stage, fingerprint):
+        previous = self.state.get(stage.name)
+        if stage.always or self.force or not previous or previous["fingerprint"] != fingerprint:
+            return False
+        return all(path_fingerprint(path)["hash"] == previous["outputs"].get(path)
+                   for path in stage.outputs)
+
+    def record(self, stage, status, seconds, fingerprint=None, inputs=None, outputs=None, error=None):
+        """Строка журнала запусков: время стадии и происхождение ее выходов"""
+        entry = {
+            "run": self.run_id,
+            "stage": stage.name,
+            "status": status,
+            "seconds": round(seconds, 3),
+            "fingerprint": fingerprint,
+            "deps": stage.deps,
+            "params": stage.params,
+            "inputs": inputs or {},
+            "outputs": outputs or {},
+        }
+        if error:
+            entry["error"] = error
+        with self.lock:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            if status == "ran" and not stage.always:
+                self.state[stage.name] = {
+                    "fingerprint": fingerprint,
+                    "outputs": {path: info["hash"] for path, info in outputs.items()},
+                    "run": self.run_id,
+                }
+                tmp_path = self.state_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(self.state, f, indent=2)
+                os.replace(tmp_path, self.state_path)
+
+    def run_stage(self, stage):
+        start = time.time()
+        fingerprint, inputs = stage.fingerprint()
+        if self.is_up_to_date(stage, fingerprint):
+            seconds = time.time() - start
+            outputs = {path: path_fingerprint(path) for path in stage.outputs}
+            self.record(stage, "skipped", seconds, fingerprint, inputs, outputs)
+            print(f"⏭️  {stage.name}: актуально, пропущено ({seconds:.2f} c)")
+            return "skipped"
+
+        print(f"▶️  {stage.name}: запуск")
+        try:
+            stage.func()
+        except Exception as e:
+            seconds = time.time() - start
+            self.record(stage, "failed", seconds, fingerprint, inputs, error=str(e))
+            print(f"❌ {stage.name}: ошибка через {seconds:.1f} c: {e}")
+            return "failed"
+
+        seconds = time.time() - start
+        outputs = {path: path_fingerprint(path) for path in stage.outputs}
+        self.record(stage, "ran", seconds, fingerprint, inputs, outputs)
+        print(f"✅ {stage.name}: выполнено за {seconds:.1f} c")
+        return "ran"
+
+    def run(self):
+        """Запускает все стадии; возвращает {стадия: ran/skipped/failed/blocked}"""
+        results = {}
+        pending = dict(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    statuses = [results.get(dep) for dep in stage.deps if dep in self.stages]
+                    if any(s in ("failed", "blocked") for s in statuses):
+                        results[name] = "blocked"
+                        self.record(stage, "blocked", 0.0)
+                        print(f"⛔ {name}: пропущено из-за ошибки в зависимостях")
+                        del pending[name]
+                    elif all(s in ("ran", "skipped") for s in statuses):
+                        running[pool.submit(self.run_stage, stage)] = name
+                        del pending[name]
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        return results
+
+
+def build_stages(BASE_DIR, train_args, until='train'):
+    """Стадии check -> convert[train, val] -> prepare[train, val] -> data.yaml -> train"""
+    from train_server import build_parser as train_parser
+
+    dataset_dir = os.path.join(BASE_DIR, 'dataset')
+    data_dir = os.path.join(BASE_DIR, 'data')
+    stages = []
+
+    def run_check():
+        from check_dataset import check_dataset
+        check_dataset()
+
+    stages.append(Stage('check', run_check, always=True))
+
+    for split in SPLITS:
+        def run_convert(split=split):
+            from convert_annotations_server import convert_split
+            convert_split(split, BASE_DIR)
+
+        source = os.path.join(BASE_DIR, f'VisDrone2019-VID-{split}')
+        stages.append(Stage(
+            f'convert:{split}', run_convert,
+            inputs=[os.path.join(source, 'annotations'), os.path.join(source, 'sequences')],
+            outputs=[os.path.join(dataset_dir, 'sequences', split), os.path.join(dataset_dir, 'labels', split)],
+            deps=['check'],
+            code=['convert_annotations_server.py', 'label_cache.py'],
+        ))
+
+    for split in SPLITS:
+        def run_prepare(split=split):
+            from prepare_server_dataset import prepare_split
+            prepare_split(split, os.path.join(dataset_dir, 'sequences'), os.path.join(dataset_dir, 'labels'), data_dir)
+
+        stages.append(Stage(
+            f'prepare:{split}', run_prepare,
+            inputs=[os.path.join(dataset_dir, 'sequences', split), os.path.join(dataset_dir, 'labels', split)],
+            outputs=[os.path.join(data_dir, split)],
+            deps=[f'convert:{split}'],
+            code=['prepare_server_dataset.py', 'label_cache.py'],
+        ))
+
+    def run_data_yaml():
+        from prepare_server_dataset import write_data_yaml
+        write_data_yaml(data_dir)
+
+    yaml_path = os.path.join(data_dir, 'data.yaml')
+    stages.append(Stage(
+        'prepare:data_yaml', run_data_yaml,
+        outputs=[yaml_path],
+        deps=[f'prepare:{split}' for split in SPLITS],
+        params={"data_dir": data_dir},
+        code=['prepare_server_dataset.py'],
+    ))
+
+    # Обучение запускается отдельным процессом, как в bench_sampling.py и sweep.py
+    train_opts = train_parser().parse_args(train_args)
+    weights = os.path.join(train_opts.project or os.path.join(BASE_DIR, 'results'), train_opts.name,
+                           'weights', 'best.pt')
+
+    def run_train():
+        command = [sys.executable, os.path.join(PROJECT_DIR, 'train_server.py'), *train_args]
+        if not train_opts.exist_ok:
+            command.append('--exist-ok')
+        start = time.time()
+        result = subprocess.run(command)
+        if result.returncode != 0:
+            raise RuntimeError(f"train_server.py завершился с кодом {result.returncode}")
+        # С --exist-ok в папке может остаться best.pt прошлого запуска - он не считается результатом
+        if not os.path.exists(weights) or os.path.getmtime(weights) < start:
+            raise RuntimeError(f"обучение не записало новый {weights}")
+
+    stages.append(Stage(
+        'train', run_train,
+        inputs=[yaml_path] + [os.path.join(data_dir, split) for split in SPLITS],
+        outputs=[weights],
+        deps=['prepare:data_yaml'],
+        params={"args": train_args},
+        code=['train_server.py', 'sampling.py', 'label_cache.py'],
+    ))
+
+    keep = STAGE_GROUPS[:STAGE_GROUPS.index(until) + 1]
+    return [stage for stage in stages if stage.group in keep]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Пайплайн check -> convert -> prepare -> train с пропуском актуальных стадий',
+        epilog='Остальные аргументы передаются train_server.py, например: --epochs 100 --batch 32')
+    parser.add_argument('--until', choices=STAGE_GROUPS, default='train',
+                        help='Последняя стадия пайплайна')
+    parser.add_argument('--force', action='store_true',
+                        help='Выполнить все стадии, даже актуальные')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Стадий одновременно (train и val обрабатываются параллельно)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Показать, какие стадии устарели, ничего не запуская')
+    args, train_args = parser.parse_known_args(argv)
+
+    print("🚀 === ПАЙПЛАЙН ДАННЫХ И ОБУЧЕНИЯ ===")
+    print("=" * 50)
+
+    BASE_DIR = get_base_dir()
+    runs_dir = os.path.join(BASE_DIR, 'runs')
+    stages = build_stages(BASE_DIR, train_args, args.until)
+    runner = PipelineRunner(stages, runs_dir, workers=args.workers, force=args.force)
+
+    print(f"📁 Базовая директория: {BASE_DIR}")
+    print(f"🧩 Стадии: {', '.join(stage.name for stage in stages)}")
+
+    if args.dry_run:
+        print()
+        for stage in stages:
+            if stage.always:
+                print(f"🔁 всегда      {stage.name}")
+                continue
+            fingerprint, _ = stage.fingerprint()
+            fresh = runner.is_up_to_date(stage, fingerprint)
+            print(f"{'⏭️  актуально' if fresh else '▶️  устарело '}  {stage.name}")
+        print("\n💡 Стадии после устаревших тоже перезапустятся, если их входы изменятся")
+        return 0
+
+    start = time.time()
+    results = runner.run()
+
+    print(f"\n📊 Итог запуска {runner.run_id} ({time.time() - start:.1f} c):")
+    for name in runner.stages:
+        print(f"   {name:<20}{results.get(name, '—')}")
+    print(f"📜 Журнал запусков: {runner.log_path}")
+
+    return 1 if any(status in ("failed", "blocked") for status in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,99 @@
 import os
 import shutil
-from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
+from config import get_base_dir
+from label_cache import build_label_cache, load_shapes, parse_label_text
+
+SPLIT_TITLES = {'train': 'обучающих', 'val': 'валидационных'}
+
+
+def copy_video(video_folder, sequences_dir, labels_dir, images_out, labels_out, shapes):
+    """
+    Копирует кадры и разметку одного видео в data/<split>.
+    Возвращает число кадров и {путь кадра: (shape_hw, разметка)} для labels.cache; кадры,
+    размер которых неизвестен конвертеру, не возвращаются - их заголовки прочитает build_label_cache
+    """
+    video_path = os.path.join(sequences_dir, video_folder)
+    video_label_path = os.path.join(labels_dir, video_folder)
+    video_shapes = shapes.get(video_folder, {})
+
+    entries = {}
+    img_files = [f for f in os.listdir(video_path) if f.endswith('.jpg')]
+    for img_file in img_files:
+        dst_img = os.path.join(images_out, f"{video_folder}_{img_file}")
+        shutil.copy2(os.path.join(video_path, img_file), dst_img)
+
+        # Разметка читается один раз: копируется и сразу разбирается для кэша
+        label_file = os.path.splitext(img_file)[0] + '.txt'
+        src_label = os.path.join(video_label_path, label_file)
+        lb = None
+        if os.path.exists(src_label):
+            with open(src_label, 'r') as f:
+                text = f.read()
+            with open(os.path.join(labels_out, f"{video_folder}_{label_file}"), 'w') as f:
+                f.write(text)
+            lb = parse_label_text(text)
+
+        if img_file in video_shapes:
+            w, h = video_shapes[img_file]
+            entries[dst_img] = ((h, w), lb)
+
+    return len(img_files), entries
+
+
+def prepare_split(data_type, source_sequences, source_labels, data_dir, workers=8):
+    """Копирует один набор (train/val) в data/<data_type> и пишет labels.cache. Возвращает число кадров"""
+    sequences_dir = os.path.join(source_sequences, data_type)
+    labels_dir = os.path.join(source_labels, data_type)
+    images_out = os.path.realpath(os.path.join(data_dir, data_type, 'images'))
+    labels_out = os.path.realpath(os.path.join(data_dir, data_type, 'labels'))
+
+    if not os.path.exists(sequences_dir):
+        return 0
+    os.makedirs(images_out, exist_ok=True)
+    os.makedirs(labels_out, exist_ok=True)
+
+    print(f"\n📁 Обработка {SPLIT_TITLES.get(data_type, data_type)} данных...")
+    video_folders = [f for f in os.listdir(sequences_dir) if os.path.isdir(os.path.join(sequences_dir, f))]
+    shapes = load_shapes(labels_dir)
+
+    known = {}
+    image_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            tqdm(total=len(video_folders), desc=f"Обработка {data_type}",
+                 bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}") as pbar:
+        futures = [pool.submit(copy_video, video_folder, sequences_dir, labels_dir, images_out, labels_out, shapes)
+                   for video_folder in video_folders]
+        for future in as_completed(futures):
+            count, entries = future.result()
+            image_count += count
+            known.update(entries)
+            pbar.set_postfix({"images": image_count})
+            pbar.update(1)
+
+    # labels.cache в формате ultralytics: обучение не будет сканировать все кадры заново
+    cache_file, (nf, nm, ne, _, total) = build_label_cache(os.path.join(data_dir, data_type), known)
+    print(f"🗂️  {cache_file}: {total} кадров, с объектами {nf}, без разметки {nm}, пустых {ne}")
+    return image_count
+
+
+def write_data_yaml(data_dir):
+    """data.yaml для ultralytics; возвращает путь к файлу"""
+    yaml_content = f"""path: {data_dir}
+train: train/images
+val: val/images
+
+nc: 10
+names: ["pedestrian", "person", "bicycle", "car", "van", "truck", "tricycle", "awning-tricycle", "bus", "motor"]
+"""
+
+    yaml_path = os.path.join(data_dir, 'data.yaml')
+    with open(yaml_path, 'w') as f:
+        f.write(yaml_content)
+    return yaml_path
+
 
 def create_server_dataset():
     """
@@ -12,7 +103,7 @@ def create_server_dataset():
     print("=" * 50)
 
     # Базовая директория на сервере
-    BASE_DIR = os.path.expanduser('~/Bespilot_lopatinBeglov')
+    BASE_DIR = get_base_dir()
 
     # Пути к данным
     DATA_DIR = os.path.join(BASE_DIR, 'data')
@@ -46,73 +137,8 @@ def create_server_dataset():
         print("💡 Убедитесь, что папка 'dataset' скопирована в BASE_DIR")
         return
 
-    # Копируем данные из train
-    train_sequences = os.path.join(source_sequences, 'train')
-    train_labels = os.path.join(source_labels, 'train')
-
-    train_count = 0
-    if os.path.exists(train_sequences):
-        print(f"\n📁 Обработка обучающих данных...")
-        video_folders = [f for f in os.listdir(train_sequences) if os.path.isdir(os.path.join(train_sequences, f))]
-
-        with tqdm(total=len(video_folders), desc="Обработка train",
-                  bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}") as pbar:
-            for video_folder in video_folders:
-                video_path = os.path.join(train_sequences, video_folder)
-
-                # Копируем изображения
-                img_files = [f for f in os.listdir(video_path) if f.endswith('.jpg')]
-                for img_file in img_files:
-                    src_img = os.path.join(video_path, img_file)
-                    dst_img = os.path.join(TRAIN_IMAGES_DIR, f"{video_folder}_{img_file}")
-                    shutil.copy2(src_img, dst_img)
-                    train_count += 1
-
-                # Копируем аннотации
-                video_label_path = os.path.join(train_labels, video_folder)
-                if os.path.exists(video_label_path):
-                    label_files = [f for f in os.listdir(video_label_path) if f.endswith('.txt')]
-                    for label_file in label_files:
-                        src_label = os.path.join(video_label_path, label_file)
-                        dst_label = os.path.join(TRAIN_LABELS_DIR, f"{video_folder}_{label_file}")
-                        shutil.copy2(src_label, dst_label)
-
-                pbar.set_postfix({"images": train_count})
-                pbar.update(1)
-
-    # Копируем данные из val
-    val_sequences = os.path.join(source_sequences, 'val')
-    val_labels = os.path.join(source_labels, 'val')
-
-    val_count = 0
-    if os.path.exists(val_sequences):
-        print(f"\n📁 Обработка валидационных данных...")
-        video_folders = [f for f in os.listdir(val_sequences) if os.path.isdir(os.path.join(val_sequences, f))]
-
-        with tqdm(total=len(video_folders), desc="Обработка val",
-                  bar_format="{l_bar}{bar}| {n_fmt}/{total_fmt}") as pbar:
-            for video_folder in video_folders:
-                video_path = os.path.join(val_sequences, video_folder)
-
-                # Копируем изображения
-                img_files = [f for f in os.listdir(video_path) if f.endswith('.jpg')]
-                for img_file in img_files:
-                    src_img = os.path.join(video_path, img_file)
-                    dst_img = os.path.join(VAL_IMAGES_DIR, f"{video_folder}_{img_file}")
-                    shutil.copy2(src_img, dst_img)
-                    val_count += 1
-
-                # Копируем аннотации
-                video_label_path = os.path.join(val_labels, video_folder)
-                if os.path.exists(video_label_path):
-                    label_files = [f for f in os.listdir(video_label_path) if f.endswith('.txt')]
-                    for label_file in label_files:
-                        src_label = os.path.join(video_label_path, label_file)
-                        dst_label = os.path.join(VAL_LABELS_DIR, f"{video_folder}_{label_file}")
-                        shutil.copy2(src_label, dst_label)
-
-                pbar.set_postfix({"images": val_count})
-                pbar.update(1)
+    train_count = prepare_split('train', source_sequences, source_labels, DATA_DIR)
+    val_count = prepare_split('val', source_sequences, source_labels, DATA_DIR)
 
     print(f"\n📊 Результаты подготовки:")
     print(f"✅ Создано {train_count} обучающих изображений")
@@ -121,17 +147,7 @@ def create_server_dataset():
 
     # Создаем data.yaml для сервера
     print(f"\n📄 Создание конфигурационного файла...")
-    yaml_content = f"""path: {DATA_DIR}
-train: train/images
-val: val/images
-
-nc: 10
-names: ["pedestrian", "person", "bicycle", "car", "van", "truck", "tricycle", "awning-tricycle", "bus", "motor"]
-"""
-
-    yaml_path = os.path.join(DATA_DIR, 'data.yaml')
-    with open(yaml_path, 'w') as f:
-        f.write(yaml_content)
+    yaml_path = write_data_yaml(DATA_DIR)
 
     print(f"✅ Создан файл конфигурации: {yaml_path}")
     print(f"\n🎉 Подготовка данных завершена успешно!")
@@ -0,0 +1,268 @@
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import get_base_dir
+
+NUM_CLASSES = 10
+CLASS_NAMES = ["pedestrian", "person", "bicycle", "car", "van", "truck", "tricycle", "awning-tricycle", "bus",
+               "motor"]
+
+
+def read_label_classes(label_path):
+    """Классы объектов из YOLO-разметки одного кадра"""
+    if not os.path.exists(label_path):
+        return np.zeros(0, dtype=np.int64)
+    with open(label_path, 'r') as f:
+        return np.array([int(line.split(maxsplit=1)[0]) for line in f if line.strip()], dtype=np.int64)
+
+
+def class_histograms(label_files, num_classes=NUM_CLASSES, workers=8):
+    """
+    Гистограммы классов по кадрам (N, num_classes) из .txt файлов разметки.
+    Файлы читаются параллельно
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        classes = list(pool.map(read_label_classes, label_files))
+    return histograms_from_classes(classes, num_classes)
+
+
+def histograms_from_classes(classes, num_classes=NUM_CLASSES):
+    """Гистограммы по спискам классов кадров (например, dataset.labels[i]['cls'] ultralytics)"""
+    hist = np.zeros((len(classes), num_classes), dtype=np.int64)
+    for i, cls in enumerate(classes):
+        cls = np.asarray(cls, dtype=np.int64).reshape(-1)
+        cls = cls[(cls >= 0) & (cls < num_classes)]
+        hist[i] = np.bincount(cls, minlength=num_classes)
+    return hist
+
+
+def class_balanced_weights(hist, power=0.5, empty_weight=None):
+    """
+    Веса кадров для сбалансированной по классам выборки.
+    Вес класса ~ (1 / число объектов класса) ** power, вес кадра - вес его самого редкого класса,
+    так что кадры с редкими классами (bicycle, awning-tricycle) выбираются чаще, чем кадры только с car.
+    Кадры без объектов получают минимальный вес (или empty_weight). Средний вес = 1
+    """
+    counts = hist.sum(axis=0).astype(np.float64)
+    class_weights = np.where(counts > 0, 1.0 / np.maximum(counts, 1.0), 0.0) ** power
+    class_weights /= class_weights[counts > 0].min() if (counts > 0).any() else 1.0
+
+    present = hist > 0
+    weights = np.where(present, class_weights[None, :], 0.0).max(axis=1)
+
+    empty = ~present.any(axis=1)
+    if empty.any():
+        fill = empty_weight if empty_weight is not None else (weights[~empty].min() if (~empty).any() else 1.0)
+        weights[empty] = fill
+
+    return weights / weights.mean()
+
+
+class HardExampleTracker:
+    """
+    Скользящее среднее (EMA) loss для каждого кадра по прошлым эпохам.
+    loss - число (один на все кадры батча) или массив, по значению на кадр;
+    с мозаикой loss приписывается основному кадру мозаики
+    """
+
+    def __init__(self, num_images, momentum=0.7):
+        self.loss = np.full(num_images, np.nan)
+        self.momentum = momentum
+
+    def update(self, indices, loss):
+        indices = np.asarray(indices, dtype=np.int64)
+        old = self.loss[indices]
+        self.loss[indices] = np.where(np.isnan(old), loss, self.momentum * old + (1 - self.momentum) * loss)
+
+    def factors(self, strength=1.0, clip=(0.25, 4.0)):
+        """Множители веса: кадры с loss выше среднего выбираются чаще"""
+        seen = ~np.isnan(self.loss)
+        if not seen.any():
+            return np.ones_like(self.loss)
+        relative = np.where(seen, self.loss / self.loss[seen].mean(), 1.0)
+        return np.clip(relative ** strength, *clip)
+
+
+class WeightedSampler:
+    """
+    Сэмплер для DataLoader: на каждую эпоху выбирает len(weights) индексов с возвращением
+    пропорционально весам. Веса можно менять между эпохами (set_weights).
+    DataLoader заранее берет индексы следующей эпохи (prefetch), еще до on_train_epoch_end,
+    поэтому индексы выбираются блоками по chunk с текущими весами: старые веса действуют
+    только на первый блок эпохи, а не на всю эпоху
+    """
+
+    def __init__(self, weights, seed=0, chunk=256):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+        self.chunk = chunk
+
+    def set_weights(self, weights):
+        self.weights = np.asarray(weights, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.weights)
+
+    def __iter__(self):
+        remaining = len(self.weights)
+        while remaining > 0:
+            size = min(self.chunk, remaining)
+            p = self.weights / self.weights.sum()
+            yield from self.rng.choice(len(p), size=size, replace=True, p=p).tolist()
+            remaining -= size
+
+
+def make_trainer_class(sampling='uniform', balance_power=0.5, hard_weight=0.0):
+    """
+    Создает DetectionTrainer ultralytics с выборкой кадров по весам.
+    sampling: 'uniform' (стандартное перемешивание) или 'balanced' (веса по классам);
+    hard_weight > 0 дополнительно смещает выборку к кадрам с большим loss в прошлых эпохах
+    """
+    import torch
+    from ultralytics.models.yolo.detect import DetectionTrainer
+    from ultralytics.data.build import InfiniteDataLoader, PIN_MEMORY
+
+    class PerImageBCE(torch.nn.Module):
+        """
+        BCE классификации из v8DetectionLoss (reduction='none'): возвращает тот же тензор
+        и запоминает сумму loss по каждому кадру батча
+        """
+
+        def __init__(self, bce):
+            super().__init__()
+            self.bce = bce
+            self.per_image = None
+
+        def forward(self, pred, target):
+            loss = self.bce(pred, target)
+            self.per_image = loss.detach().flatten(1).sum(1).float().cpu().numpy()
+            return loss
+
+    class SampledDetectionTrainer(DetectionTrainer):
+
+        def get_dataloader(self, dataset_path, batch_size=16, rank=0, mode="train"):
+            # Только одно устройство (rank == -1): в DDP ultralytics импортирует тренер по имени модуля,
+            # а этот класс создается фабрикой, поэтому train_server.py запрещает выборку на нескольких GPU
+            if mode != "train" or (sampling == 'uniform' and hard_weight <= 0) or rank != -1:
+                return super().get_dataloader(dataset_path, batch_size, rank, mode)
+
+            dataset = self.build_dataset(dataset_path, mode, batch_size)
+            hist = histograms_from_classes([label['cls'] for label in dataset.labels])
+
+            if sampling == 'balanced':
+                self.base_weights = class_balanced_weights(hist, balance_power)
+            else:
+                self.base_weights = np.ones(len(hist))
+            self.sampler = WeightedSampler(self.base_weights, seed=self.args.seed)
+            self.hard_tracker = HardExampleTracker(len(hist)) if hard_weight > 0 else None
+            self.file_index = {f: i for i, f in enumerate(dataset.im_files)}
+            self._batch_files = []
+
+            counts = hist.sum(axis=0)
+            print(f"📊 Выборка '{sampling}'{' + hard examples' if hard_weight > 0 else ''}: "
+                  f"{len(hist)} кадров, объектов по классам: {dict(zip(CLASS_NAMES, counts.tolist()))}")
+
+            workers = min(os.cpu_count() or 1, self.args.workers)
+            return InfiniteDataLoader(
+                dataset=dataset,
+                batch_size=batch_size,
+                shuffle=False,
+                sampler=self.sampler,
+                num_workers=workers,
+                pin_memory=PIN_MEMORY,
+                collate_fn=getattr(dataset, "collate_fn", None),
+            )
+
+        def per_image_bce(self):
+            """
+            Подменяет BCE критерия модели на PerImageBCE. Критерий ultralytics создает при первом
+            forward, поэтому здесь он создается заранее. None, если у критерия нет bce
+            """
+            model = self.model.module if hasattr(self.model, 'module') else self.model
+            if getattr(model, 'criterion', None) is None and hasattr(model, 'init_criterion'):
+                model.criterion = model.init_criterion()
+            criterion = getattr(model, 'criterion', None)
+            bce = getattr(criterion, 'bce', None)
+            if bce is None:
+                return None
+            if not isinstance(bce, PerImageBCE):
+                criterion.bce = bce = PerImageBCE(bce)
+            return bce
+
+        def preprocess_batch(self, batch):
+            # Запоминаем кадры батча, чтобы приписать им loss после шага
+            self._batch_files = batch.get('im_file', [])
+            if getattr(self, 'hard_tracker', None) is not None:
+                self._per_image_bce = self.per_image_bce()
+                if self._per_image_bce is not None:
+                    self._per_image_bce.per_image = None
+            return super().preprocess_batch(batch)
+
+    def on_train_batch_end(trainer):
+        tracker = getattr(trainer, 'hard_tracker', None)
+        if tracker is None or trainer.loss_items is None:
+            return
+        # loss классификации каждого кадра; если критерий ultralytics устроен иначе -
+        # общий loss батча для всех его кадров
+        bce = getattr(trainer, '_per_image_bce', None)
+        per_image = bce.per_image if bce is not None else None
+        if per_image is None or len(per_image) != len(trainer._batch_files):
+            per_image = np.full(len(trainer._batch_files), float(trainer.loss_items.sum()))
+
+        known = [i for i, f in enumerate(trainer._batch_files) if f in trainer.file_index]
+        if known:
+            tracker.update([trainer.file_index[trainer._batch_files[i]] for i in known], per_image[known])
+
+    def on_train_epoch_end(trainer):
+        tracker = getattr(trainer, 'hard_tracker', None)
+        if tracker is not None:
+            trainer.sampler.set_weights(trainer.base_weights * tracker.factors(hard_weight))
+
+    def trainer_factory(*args, **kwargs):
+        trainer = SampledDetectionTrainer(*args, **kwargs)
+        trainer.add_callback("on_train_batch_end", on_train_batch_end)
+        trainer.add_callback("on_train_epoch_end", on_train_epoch_end)
+        return trainer
+
+    return trainer_factory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Статистика классов и веса выборки для обучения')
+    parser.add_argument('--labels', type=str, default=None,
+                        help='Папка с YOLO-разметкой (по умолчанию BASE_DIR/data/train/labels)')
+    parser.add_argument('--balance-power', type=float, default=0.5,
+                        help='Степень балансировки: 0 - равномерно, 1 - обратно пропорционально частоте')
+    args = parser.parse_args(argv)
+
+    labels_dir = args.labels or os.path.join(get_base_dir(), 'data', 'train', 'labels')
+    if not os.path.exists(labels_dir):
+        print(f"❌ Ошибка: папка разметки не найдена: {labels_dir}")
+        return
+
+    print("📊 === СТАТИСТИКА КЛАССОВ ДЛЯ ВЫБОРКИ ===")
+    print("=" * 50)
+
+    label_files = sorted(os.path.join(labels_dir, f) for f in os.listdir(labels_dir) if f.endswith('.txt'))
+    hist = class_histograms(label_files)
+    weights = class_balanced_weights(hist, args.balance_power)
+
+    # Ожидаемая доля объектов каждого класса при равномерной и сбалансированной выборке
+    uniform_share = hist.sum(axis=0) / max(hist.sum(), 1)
+    balanced = (hist * weights[:, None]).sum(axis=0)
+    balanced_share = balanced / max(balanced.sum(), 1e-9)
+
+    print(f"📁 Кадров: {len(label_files)}")
+    print(f"\n{'Класс':<18}{'Объектов':>10}{'Кадров':>10}{'Равном.':>10}{'Сбаланс.':>10}")
+    print("-" * 58)
+    for c, name in enumerate(CLASS_NAMES):
+        print(f"{name:<18}{hist[:, c].sum():>10}{(hist[:, c] > 0).sum():>10}"
+              f"{uniform_share[c] * 100:>9.1f}%{balanced_share[c] * 100:>9.1f}%")
+    print(f"\n⚖️  Веса кадров: min {weights.min():.2f}, max {weights.max():.2f}")
+
+
+if __name__ == "__main__":
+    main()
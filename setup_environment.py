@@ -5,28 +5,198 @@
 import os
 import subprocess
 import sys
+import time
+import hashlib
+import argparse
+import platform
 from pathlib import Path
 
+from config import get_base_dir
+
+# Индекс с CPU-сборками torch/torchvision для узлов без GPU
+TORCH_CPU_INDEX = "https://download.pytorch.org/whl/cpu"
+
+# Файл внутри venv с хэшем lock-файла, по которому окружение было установлено
+LOCK_STAMP = '.bespilot_lock_hash'
+
+# Время выполнения шагов: (описание, секунды, успех)
+STEP_TIMINGS = []
+
 def run_command(command, description):
-    """Выполняет команду с выводом прогресса"""
+    """Выполняет команду (строку для shell или список аргументов) с выводом прогресса"""
     print(f"🔄 {description}...")
+    start = time.perf_counter()
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        result = subprocess.run(command, shell=isinstance(command, str), check=True,
+                                capture_output=True, text=True)
+        STEP_TIMINGS.append((description, time.perf_counter() - start, True))
         print(f"✅ {description} завершено успешно")
         return True
     except subprocess.CalledProcessError as e:
+        STEP_TIMINGS.append((description, time.perf_counter() - start, False))
         print(f"❌ Ошибка при {description}: {e}")
         print(f"Вывод ошибки: {e.stderr}")
         return False
 
-def setup_virtual_environment():
+def print_timings():
+    """Печатает время каждого шага установки"""
+    if not STEP_TIMINGS:
+        return
+    print("\n⏱️  Время шагов:")
+    print("-" * 50)
+    for description, elapsed, ok in STEP_TIMINGS:
+        print(f"{'✅' if ok else '❌'} {description:<38}{elapsed:>8.1f} c")
+    print("-" * 50)
+    print(f"   {'Всего':<38}{sum(t for _, t, _ in STEP_TIMINGS):>8.1f} c")
+
+def venv_python(venv_dir):
+    """Путь к интерпретатору внутри виртуального окружения"""
+    if os.name == 'nt':
+        return os.path.join(venv_dir, 'Scripts', 'python.exe')
+    return os.path.join(venv_dir, 'bin', 'python')
+
+def parse_wheel_name(filename):
+    """Имя пакета и версия из имени wheel-файла (name-version-...-platform.whl)"""
+    parts = filename[:-len('.whl')].split('-')
+    return parts[0].replace('_', '-').lower(), parts[1]
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def write_lockfile(wheelhouse, lock_path):
+    """
+    Создает lock-файл по содержимому wheelhouse: точные версии и sha256 каждого wheel
+    (устанавливается через pip install --require-hashes)
+    """
+    versions = {}
+    for filename in sorted(os.listdir(wheelhouse)):
+        if not filename.endswith('.whl'):
+            continue
+        name, version = parse_wheel_name(filename)
+        versions.setdefault(name, {}).setdefault(version, []).append(filename)
+
+    # Несколько версий одного пакета - неоднозначность: какую из них разрешил pip, по файлам не понять
+    ambiguous = {name: sorted(found) for name, found in versions.items() if len(found) > 1}
+    if ambiguous:
+        print("❌ В wheelhouse несколько версий пакетов, lock-файл не создан:")
+        for name, found in sorted(ambiguous.items()):
+            print(f"   {name}: {', '.join(found)}")
+        print(f"💡 Очистите {wheelhouse} и соберите wheelhouse заново")
+        return False
+
+    packages = {}
+    for name, found in versions.items():
+        (version, filenames), = found.items()
+        packages[name] = {"version": version,
+                          "hashes": [file_sha256(os.path.join(wheelhouse, f)) for f in filenames]}
+
+    with open(lock_path, 'w') as f:
+        f.write("# Сгенерировано setup_environment.py --build-wheelhouse\n")
+        f.write(f"# Python {platform.python_version()}, {platform.system()} {platform.machine()}\n")
+        for name, entry in sorted(packages.items()):
+            hashes = " ".join(f"--hash=sha256:{h}" for h in entry["hashes"])
+            f.write(f"{name}=={entry['version']} {hashes}\n")
+
+    print(f"✅ Lock-файл: {lock_path} ({len(packages)} пакетов)")
+    return True
+
+def build_wheelhouse(requirements_path, wheelhouse, lock_path, cpu_only=True):
+    """
+    Собирает wheel всех зависимостей (на машине с интернетом) и lock-файл к ним.
+    При cpu_only torch/torchvision берутся из CPU-индекса PyTorch
+    """
+    os.makedirs(wheelhouse, exist_ok=True)
+    # Старые wheel от прошлых сборок иначе попадут в lock-файл рядом с новыми версиями
+    for filename in os.listdir(wheelhouse):
+        if filename.endswith('.whl'):
+            os.remove(os.path.join(wheelhouse, filename))
+
+    command = [sys.executable, '-m', 'pip', 'wheel', '-r', requirements_path, '-w', wheelhouse]
+    if cpu_only:
+        command += ['--extra-index-url', TORCH_CPU_INDEX]
+    if not run_command(command, "Сборка wheelhouse"):
+        return False
+
+    start = time.perf_counter()
+    ok = write_lockfile(wheelhouse, lock_path)
+    STEP_TIMINGS.append(("Создание lock-файла", time.perf_counter() - start, ok))
+    return ok
+
+def lock_hash(lock_path):
+    """Хэш lock-файла вместе с версией Python и платформой"""
+    h = hashlib.sha256()
+    with open(lock_path, 'rb') as f:
+        h.update(f.read())
+    h.update(f"{platform.python_version()}|{platform.system()}|{platform.machine()}".encode('utf-8'))
+    return h.hexdigest()
+
+def offline_install(venv_dir, wheelhouse, lock_path, recreate=False):
+    """
+    Устанавливает зависимости из локального wheelhouse без доступа к сети.
+    Если venv уже установлен по тому же lock-файлу, ничего не делает
+    """
+    start = time.perf_counter()
+    expected = lock_hash(lock_path)
+    stamp_path = os.path.join(venv_dir, LOCK_STAMP)
+    python = venv_python(venv_dir)
+
+    installed = None
+    if not recreate and os.path.exists(python) and os.path.exists(stamp_path):
+        with open(stamp_path) as f:
+            installed = f.read().strip()
+    STEP_TIMINGS.append(("Проверка lock-файла", time.perf_counter() - start, True))
+
+    if installed == expected:
+        print("⚡ Окружение соответствует lock-файлу, установка не нужна")
+        return True
+    if installed is not None:
+        print("🔄 Lock-файл изменился, окружение будет обновлено")
+
+    if recreate or not os.path.exists(python):
+        command = [sys.executable, '-m', 'venv'] + (['--clear'] if recreate else []) + [venv_dir]
+        if not run_command(command, "Создание виртуального окружения"):
+            return False
+
+    command = [python, '-m', 'pip', 'install', '--no-index', '--find-links', wheelhouse,
+               '--require-hashes', '-r', lock_path]
+    if not run_command(command, "Офлайн установка зависимостей"):
+        return False
+
+    with open(stamp_path, 'w') as f:
+        f.write(expected)
+    return True
+
+def setup_virtual_environment(argv=None):
     """Настраивает виртуальное окружение для проекта"""
+    parser = argparse.ArgumentParser(description='Настройка виртуального окружения')
+    parser.add_argument('--wheelhouse', type=str, default=None,
+                        help='Папка с wheel-файлами (по умолчанию BASE_DIR/wheelhouse)')
+    parser.add_argument('--lockfile', type=str, default=None,
+                        help='Lock-файл (по умолчанию BASE_DIR/requirements.lock)')
+    parser.add_argument('--build-wheelhouse', action='store_true',
+                        help='Собрать wheelhouse и lock-файл (нужен интернет), затем установить из них')
+    parser.add_argument('--with-cuda-torch', action='store_true',
+                        help='При сборке wheelhouse брать torch с PyPI вместо CPU-сборок')
+    parser.add_argument('--offline', action='store_true',
+                        help='Установка только из wheelhouse (включается сама, если есть wheelhouse и lock-файл)')
+    parser.add_argument('--online', action='store_true',
+                        help='Игнорировать wheelhouse и ставить пакеты из интернета')
+    parser.add_argument('--recreate', action='store_true',
+                        help='Пересоздать виртуальное окружение')
+    args = parser.parse_args(argv)
+
     print("🚀 === НАСТРОЙКА ВИРТУАЛЬНОГО ОКРУЖЕНИЯ ===")
     print("=" * 50)
     
     # Базовая директория
-    BASE_DIR = os.path.expanduser('~/Bespilot_lopatinBeglov')
+    BASE_DIR = get_base_dir()
     VENV_DIR = os.path.join(BASE_DIR, 'venv')
+    WHEELHOUSE_DIR = args.wheelhouse or os.path.join(BASE_DIR, 'wheelhouse')
+    LOCK_PATH = args.lockfile or os.path.join(BASE_DIR, 'requirements.lock')
     
     print(f"📁 Базовая директория: {BASE_DIR}")
     print(f"🐍 Виртуальное окружение: {VENV_DIR}")
@@ -40,6 +210,35 @@ def setup_virtual_environment():
                                   capture_output=True, text=True).stdout.strip()
     print(f"✅ {python_version}")
     
+    requirements_path = os.path.join(BASE_DIR, 'requirements.txt')
+    if args.build_wheelhouse:
+        print(f"\n📦 Сборка wheelhouse: {WHEELHOUSE_DIR}")
+        if not build_wheelhouse(requirements_path, WHEELHOUSE_DIR, LOCK_PATH, not args.with_cuda_torch):
+            print_timings()
+            return False
+    
+    use_offline = not args.online and (args.offline or args.build_wheelhouse or
+                                       (os.path.isdir(WHEELHOUSE_DIR) and os.path.exists(LOCK_PATH)))
+    if use_offline:
+        print(f"\n📦 Офлайн установка из {WHEELHOUSE_DIR}")
+        print(f"🔒 Lock-файл: {LOCK_PATH}")
+        if not os.path.isdir(WHEELHOUSE_DIR) or not os.path.exists(LOCK_PATH):
+            print("❌ Ошибка: для офлайн установки нужны wheelhouse и lock-файл")
+            print("💡 Соберите их на машине с интернетом: python setup_environment.py --build-wheelhouse")
+            return False
+        if not offline_install(VENV_DIR, WHEELHOUSE_DIR, LOCK_PATH, args.recreate):
+            print_timings()
+            return False
+    elif not install_online(VENV_DIR, requirements_path):
+        print_timings()
+        return False
+    
+    write_activation_files(BASE_DIR, VENV_DIR)
+    print_timings()
+    return True
+
+def install_online(VENV_DIR, requirements_path):
+    """Создает venv и ставит зависимости из интернета (исходный режим)"""
     # Создаем виртуальное окружение
     if not run_command(f"python -m venv {VENV_DIR}", "Создание виртуального окружения"):
         return False
@@ -58,7 +257,6 @@ def setup_virtual_environment():
         return False
     
     # Устанавливаем зависимости
-    requirements_path = os.path.join(BASE_DIR, 'requirements.txt')
     if os.path.exists(requirements_path):
         install_cmd = f"source {VENV_DIR}/bin/activate && pip install -r {requirements_path}"
         if os.name == 'nt':
@@ -76,6 +274,10 @@ def setup_virtual_environment():
         if not run_command(install_cmd, "Установка основных пакетов"):
             return False
     
+    return True
+
+def write_activation_files(BASE_DIR, VENV_DIR):
+    """Создает скрипт активации и инструкцию по использованию"""
     # Создаем скрипт активации
     print(f"\n📄 Создание скрипта активации...")
     activate_script_content = f"""#!/bin/bash
@@ -116,13 +318,13 @@ echo 🐍 Python: %where python%
 
 ### Linux/Mac:
 ```bash
-cd ~/Bespilot_lopatinBeglov
+cd {BASE_DIR}
 source activate_env.sh
 ```
 
 ### Windows:
 ```cmd
-cd ~/Bespilot_lopatinBeglov
+cd {BASE_DIR}
 activate_env.bat
 ```
 
@@ -130,12 +332,12 @@ activate_env.bat
 
 ### Linux/Mac:
 ```bash
-source ~/Bespilot_lopatinBeglov/venv/bin/activate
+source {VENV_DIR}/bin/activate
 ```
 
 ### Windows:
 ```cmd
-~\\Bespilot_lopatinBeglov\\venv\\Scripts\\activate
+{VENV_DIR}\\Scripts\\activate
 ```
 
 ## Проверка установки
@@ -152,16 +354,19 @@ python -c "import tqdm; print('tqdm установлен')"
 1. Активируйте окружение
 2. Перейдите в папку со скриптами:
    ```bash
-   cd ~/Bespilot_lopatinBeglov/scripts
+   cd {BASE_DIR}/scripts
    ```
-3. Запустите скрипты по порядку:
+3. Запустите этапы по порядку:
    ```bash
-   python check_dataset.py
-   python convert_annotations_server.py
-   python prepare_server_dataset.py
-   python train_server.py
+   python bespilot.py check
+   python bespilot.py convert
+   python bespilot.py prepare
+   python bespilot.py train
    ```
 
+Другая базовая директория задается переменной BESPILOT_BASE_DIR
+или секцией [paths] base_dir в bespilot.ini.
+
 ## Деактивация
 
 ```bash
@@ -0,0 +1,101 @@
+import os
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+
+class StageProfiler:
+    """
+    Замеряет время этапов обработки каждого кадра.
+    Сохраняет сводную таблицу (среднее/p95 по этапам) и Chrome trace
+    (открывается в chrome://tracing или https://ui.perfetto.dev)
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []  # (этап, кадр, начало, длительность) в секундах
+        self.frame_index = 0
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append((name, self.frame_index, start, time.perf_counter() - start))
+
+    def add(self, name, start, duration):
+        """Добавляет уже измеренный этап (например, из results.speed ultralytics)"""
+        self.events.append((name, self.frame_index, start, duration))
+
+    def summary(self):
+        """Статистика по этапам в порядке их первого появления"""
+        durations = {}
+        for name, _, _, duration in self.events:
+            durations.setdefault(name, []).append(duration)
+
+        total = sum(sum(values) for values in durations.values()) or 1.0
+        rows = []
+        for name, values in durations.items():
+            values = np.asarray(values) * 1000.0
+            rows.append({
+                "stage": name,
+                "count": len(values),
+                "mean_ms": float(values.mean()),
+                "p95_ms": float(np.percentile(values, 95)),
+                "total_ms": float(values.sum()),
+                "share": float(values.sum() / 1000.0 / total),
+            })
+        return rows
+
+    def print_summary(self):
+        print(f"{'Этап':<18}{'Кадров':>8}{'Сред., мс':>12}{'p95, мс':>10}{'Всего, с':>10}{'Доля':>8}")
+        print("-" * 66)
+        for row in self.summary():
+            print(f"{row['stage']:<18}{row['count']:>8}{row['mean_ms']:>12.2f}{row['p95_ms']:>10.2f}"
+                  f"{row['total_ms'] / 1000.0:>10.2f}{row['share'] * 100:>7.1f}%")
+
+    def save_summary(self, path):
+        """Сохраняет таблицу этапов в CSV"""
+        with open(path, 'w') as f:
+            f.write("stage,count,mean_ms,p95_ms,total_ms,share\n")
+            for row in self.summary():
+                f.write(f"{row['stage']},{row['count']},{row['mean_ms']:.4f},{row['p95_ms']:.4f},"
+                        f"{row['total_ms']:.4f},{row['share']:.4f}\n")
+
+    def save_chrome_trace(self, path):
+        """Сохраняет таймлайн в формате Chrome Trace Event (микросекунды)"""
+        pid = os.getpid()
+        trace = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+                  "args": {"name": "validate_and_visualize"}}]
+        for name, frame, start, duration in self.events:
+            trace.append({
+                "name": name,
+                "cat": "frame",
+                "ph": "X",
+                "pid": pid,
+                "tid": 0,
+                "ts": (start - self.origin) * 1e6,
+                "dur": duration * 1e6,
+                "args": {"frame": frame},
+            })
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+class NullProfiler:
+    """Профайлер-заглушка: без --profile этапы не замеряются"""
+
+    enabled = False
+    frame_index = 0
+    _null = nullcontext()
+
+    def stage(self, name):
+        return self._null
+
+    def add(self, name, start, duration):
+        pass
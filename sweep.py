@@ -0,0 +1,291 @@
+import os
+import sys
+import csv
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import subprocess
+
+from config import get_base_dir
+
+# Пространство поиска по умолчанию (можно заменить файлом --space в JSON или YAML)
+DEFAULT_SPACE = {
+    "lr0": {"type": "loguniform", "low": 1e-4, "high": 2e-2},
+    "imgsz": {"type": "choice", "values": [512, 640, 800]},
+    "batch": {"type": "choice", "values": [8, 16, 32]},
+    "hsv_h": {"type": "uniform", "low": 0.0, "high": 0.03},
+    "hsv_s": {"type": "uniform", "low": 0.3, "high": 0.9},
+    "scale": {"type": "uniform", "low": 0.2, "high": 0.7},
+    "mosaic": {"type": "uniform", "low": 0.5, "high": 1.0},
+    "fliplr": {"type": "uniform", "low": 0.0, "high": 0.5},
+}
+
+# Параметры, которые train_server.py принимает отдельными аргументами
+DIRECT_ARGS = {"imgsz", "batch", "epochs"}
+
+
+def load_space(path):
+    """Загружает пространство поиска из JSON или YAML"""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def sample_params(space, rng):
+    """Случайная конфигурация из пространства поиска"""
+    params = {}
+    for name, spec in space.items():
+        kind = spec.get("type", "choice")
+        if kind == "choice":
+            params[name] = rng.choice(spec["values"])
+        elif kind == "uniform":
+            params[name] = round(rng.uniform(spec["low"], spec["high"]), 6)
+        elif kind == "loguniform":
+            params[name] = float(f"{math.exp(rng.uniform(math.log(spec['low']), math.log(spec['high']))):.3g}")
+        elif kind == "int":
+            params[name] = rng.randint(spec["low"], spec["high"])
+        else:
+            raise ValueError(f"неизвестный тип параметра {name}: {kind}")
+    return params
+
+
+def read_metric_curve(results_csv, metric):
+    """Значения метрики по эпохам из results.csv ultralytics"""
+    if not os.path.exists(results_csv):
+        return []
+    try:
+        with open(results_csv, 'r') as f:
+            rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+        return [float(row[metric]) for row in rows if row.get(metric, '').strip()]
+    except (OSError, ValueError, KeyError):
+        # Файл может дописываться прямо сейчас
+        return []
+
+
+class ASHA:
+    """
+    Асинхронный successive halving (вариант с остановкой, как в ASHA):
+    ступени на min_epochs * eta^k эпохах; дойдя до ступени, испытание продолжается,
+    только если его метрика не ниже (1 - 1/eta)-квантиля уже записанных на этой ступени
+    """
+
+    def __init__(self, min_epochs, max_epochs, eta=3):
+        self.eta = eta
+        self.rungs = []
+        r = min_epochs
+        while r < max_epochs:
+            self.rungs.append(r)
+            r *= eta
+        self.recorded = {r: [] for r in self.rungs}
+
+    def on_result(self, trial, curve):
+        """Записывает достигнутые ступени; возвращает False, если испытание нужно остановить"""
+        keep = True
+        for rung in self.rungs:
+            if len(curve) < rung or rung in trial["rungs"]:
+                continue
+            value = max(curve[:rung])
+            trial["rungs"][rung] = value
+            self.recorded[rung].append(value)
+
+            values = sorted(self.recorded[rung])
+            # (1 - 1/eta)-квантиль записанных значений
+            pos = (len(values) - 1) * (1 - 1 / self.eta)
+            lo = int(pos)
+            hi = min(lo + 1, len(values) - 1)
+            cutoff = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+            if value < cutoff:
+                keep = False
+        return keep
+
+
+def build_slots(args):
+    """Слоты ресурсов: по --per-device испытаний на каждую GPU или --cpu-slots на CPU"""
+    if args.devices:
+        return [d.strip() for d in args.devices.split(',') for _ in range(args.per_device)]
+    return ['cpu'] * args.cpu_slots
+
+
+def launch_trial(trial, slot, args, sweep_dir, cpu_threads):
+    """Запускает train_server.py для испытания в отдельном процессе"""
+    train_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'train_server.py')
+    command = [sys.executable, train_script, '--epochs', str(args.max_epochs),
+               '--project', sweep_dir, '--name', trial["name"], '--exist-ok']
+    for key, value in trial["params"].items():
+        if key in DIRECT_ARGS:
+            command += [f'--{key}', str(value)]
+        else:
+            command += ['--set', f'{key}={value}']
+
+    env = os.environ.copy()
+    if slot == 'cpu':
+        command += ['--device', 'cpu']
+        env['OMP_NUM_THREADS'] = str(cpu_threads)
+    else:
+        # Каждое испытание видит только свою GPU
+        env['CUDA_VISIBLE_DEVICES'] = slot
+        command += ['--device', '0']
+
+    # При повторном --name ultralytics дописал бы results.csv прошлого испытания (--exist-ok)
+    trial_dir = os.path.join(sweep_dir, trial["name"])
+    shutil.rmtree(trial_dir, ignore_errors=True)
+    os.makedirs(trial_dir, exist_ok=True)
+    trial["log"] = open(os.path.join(trial_dir, 'sweep.log'), 'w')
+    trial["process"] = subprocess.Popen(command, stdout=trial["log"], stderr=subprocess.STDOUT, env=env)
+    trial["slot"] = slot
+    trial["status"] = "running"
+    trial["start"] = time.time()
+
+
+def finish_trial(trial, status):
+    process = trial.pop("process")
+    if status == "pruned" and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    trial.pop("log").close()
+    trial["status"] = status
+    trial["minutes"] = (time.time() - trial["start"]) / 60
+
+
+def write_summary(trials, sweep_dir, metric):
+    """Сводная таблица всех испытаний, лучшие сверху, упавшие внизу"""
+    param_names = sorted({k for t in trials for k in t["params"]})
+    rows = []
+    for t in trials:
+        rows.append({
+            "trial": t["name"],
+            "status": t["status"],
+            "epochs": len(t["curve"]),
+            f"best_{metric}": max(t["curve"]) if t["curve"] else '',
+            "minutes": f"{t.get('minutes', 0):.1f}",
+            **{p: t["params"].get(p, '') for p in param_names},
+        })
+    # Упавшие испытания - в конце таблицы, независимо от метрики; испытания без результата -
+    # после испытаний с результатом (в том числе с лучшим значением 0.0)
+    rows.sort(key=lambda r: (r["status"] == "failed", r[f"best_{metric}"] == '',
+                             -r[f"best_{metric}"] if r[f"best_{metric}"] != '' else 0))
+
+    path = os.path.join(sweep_dir, 'summary.csv')
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows, path
+
+
+def main():
+    print("🚀 === ПОДБОР ГИПЕРПАРАМЕТРОВ (ASHA) ===")
+    print("=" * 60)
+
+    parser = argparse.ArgumentParser(description='Параллельный подбор гиперпараметров с ранней остановкой')
+    parser.add_argument('--space', type=str, default=None,
+                        help='Пространство поиска (JSON/YAML); по умолчанию встроенное')
+    parser.add_argument('--trials', type=int, default=12,
+                        help='Число испытаний')
+    parser.add_argument('--max-epochs', type=int, default=50,
+                        help='Максимум эпох на испытание')
+    parser.add_argument('--min-epochs', type=int, default=3,
+                        help='Первая ступень successive halving, эпох')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='Коэффициент отсева: на каждой ступени продолжает ~1/eta испытаний')
+    parser.add_argument('--devices', type=str, default=None,
+                        help='GPU через запятую, например 0,1 (по умолчанию CPU)')
+    parser.add_argument('--per-device', type=int, default=1,
+                        help='Испытаний одновременно на одной GPU')
+    parser.add_argument('--cpu-slots', type=int, default=2,
+                        help='Испытаний одновременно на CPU (если --devices не задан)')
+    parser.add_argument('--metric', type=str, default='metrics/mAP50-95(B)',
+                        help='Колонка results.csv для сравнения')
+    parser.add_argument('--name', type=str, default=None,
+                        help='Имя подбора (папка results/sweeps/<name>)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed генерации конфигураций')
+    parser.add_argument('--poll', type=float, default=10.0,
+                        help='Период опроса испытаний, секунды')
+    args = parser.parse_args()
+
+    space = load_space(args.space) if args.space else DEFAULT_SPACE
+    rng = random.Random(args.seed)
+
+    name = args.name or time.strftime('sweep_%Y%m%d_%H%M%S')
+    sweep_dir = os.path.join(get_base_dir(), 'results', 'sweeps', name)
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    slots = build_slots(args)
+    cpu_threads = max(1, (os.cpu_count() or 1) // len(slots))
+    scheduler = ASHA(args.min_epochs, args.max_epochs, args.eta)
+
+    trials = [{"name": f"trial_{i:03d}", "params": sample_params(space, rng), "status": "pending",
+               "curve": [], "rungs": {}} for i in range(args.trials)]
+    with open(os.path.join(sweep_dir, 'trials.json'), 'w') as f:
+        json.dump([{"name": t["name"], "params": t["params"]} for t in trials], f, indent=2)
+
+    print(f"📁 Папка подбора: {sweep_dir}")
+    print(f"🧪 Испытаний: {args.trials}, слоты: {', '.join(slots)}")
+    print(f"✂️  Ступени отсева (эпохи): {scheduler.rungs}, eta={args.eta}")
+
+    pending = list(trials)
+    running = []
+    free_slots = list(slots)
+
+    try:
+        while pending or running:
+            # Заполняем свободные слоты
+            while pending and free_slots:
+                trial = pending.pop(0)
+                launch_trial(trial, free_slots.pop(0), args, sweep_dir, cpu_threads)
+                running.append(trial)
+                print(f"▶️  {trial['name']} на {trial['slot']}: {trial['params']}")
+
+            time.sleep(args.poll)
+
+            for trial in list(running):
+                curve = read_metric_curve(os.path.join(sweep_dir, trial["name"], 'results.csv'), args.metric)
+                if len(curve) > len(trial["curve"]):
+                    trial["curve"] = curve
+
+                # Ступени записываются и для завершившихся испытаний - с ними сравниваются остальные
+                keep = scheduler.on_result(trial, trial["curve"])
+
+                status = None
+                returncode = trial["process"].poll()
+                if returncode is not None:
+                    # Упавшее испытание не ранжируется как завершенное, даже если успело записать эпохи
+                    status = "completed" if returncode == 0 and trial["curve"] else "failed"
+                elif not keep:
+                    status = "pruned"
+
+                if status:
+                    finish_trial(trial, status)
+                    running.remove(trial)
+                    free_slots.append(trial["slot"])
+                    best = max(trial["curve"]) if trial["curve"] else 0.0
+                    icon = {"completed": "✅", "pruned": "✂️ ", "failed": "❌"}[status]
+                    print(f"{icon} {trial['name']}: {status} после {len(trial['curve'])} эпох, лучший {best:.4f}")
+    except KeyboardInterrupt:
+        print("\n🛑 Остановка подбора...")
+        for trial in running:
+            finish_trial(trial, "pruned")
+            trial["status"] = "stopped"
+
+    rows, summary_path = write_summary(trials, sweep_dir, args.metric)
+
+    print("\n📊 Результаты подбора:")
+    print("-" * 60)
+    for row in rows[:10]:
+        best = row[f"best_{args.metric}"]
+        best = f"{best:.4f}" if best != '' else '—'
+        print(f"{row['trial']:<12}{row['status']:<11}{row['epochs']:>4} эп.  {best}")
+    print(f"\n💾 Таблица сравнения: {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Категории VisDrone: 1..10 - объекты, 0 - игнорируемые области, 11 - "прочее"
+OBJECT_CATEGORIES = list(range(1, 11))
+# Примерные доли категорий в VisDrone-VID (car и pedestrian преобладают)
+CATEGORY_WEIGHTS = [0.18, 0.06, 0.03, 0.40, 0.08, 0.04, 0.03, 0.02, 0.02, 0.14]
+
+
+def generate_sequence(out_dir, split, name, frames, width, height, boxes, seed, quality=90):
+    """
+    Пишет одну последовательность: кадры sequences/<name>/0000001.jpg ... и
+    annotations/<name>.txt в формате VisDrone-VID:
+    frame, target_id, x, y, w, h, score, category, truncation, occlusion.
+    Объекты движутся с постоянной скоростью и отражаются от краев кадра;
+    одна игнорируемая область (категория 0) и один объект "прочее" (11) на последовательность
+    """
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    root = os.path.join(out_dir, f'VisDrone2019-VID-{split}')
+    seq_dir = os.path.join(root, 'sequences', name)
+    ann_dir = os.path.join(root, 'annotations')
+    os.makedirs(seq_dir, exist_ok=True)
+    os.makedirs(ann_dir, exist_ok=True)
+
+    # Фон с шумом, чтобы JPEG был похож по размеру на реальные кадры
+    background = rng.integers(40, 200, size=(height, width, 3), dtype=np.uint8)
+
+    n = boxes + 1
+    sizes = np.stack([rng.integers(8, max(9, width // 12), n), rng.integers(8, max(9, height // 10), n)], axis=1)
+    pos = rng.uniform(0, 1, size=(n, 2)) * (np.array([width, height]) - sizes)
+    vel = rng.uniform(-4, 4, size=(n, 2))
+    categories = rng.choice(OBJECT_CATEGORIES, size=n, p=CATEGORY_WEIGHTS)
+    categories[-1] = 11
+    colors = rng.integers(0, 256, size=(n, 3), dtype=np.uint8)
+
+    ignored = (int(width * 0.7), int(height * 0.05), int(width * 0.25), int(height * 0.15))
+
+    lines = []
+    total_bytes = 0
+    for frame in range(1, frames + 1):
+        image = background.copy()
+        x, y, w, h = ignored
+        image[y:y + h, x:x + w] = 0
+        lines.append(f"{frame},-1,{x},{y},{w},{h},0,0,0,0\n")
+
+        for i in range(n):
+            bx, by = pos[i].astype(int)
+            bw, bh = sizes[i]
+            image[by:by + bh, bx:bx + bw] = colors[i]
+            lines.append(f"{frame},{i + 1},{bx},{by},{bw},{bh},1,{categories[i]},0,0\n")
+
+        pos += vel
+        over = (pos < 0) | (pos > np.array([width, height]) - sizes)
+        vel[over] *= -1
+        pos = np.clip(pos, 0, np.array([width, height]) - sizes)
+
+        path = os.path.join(seq_dir, f"{frame:07d}.jpg")
+        Image.fromarray(image).save(path, quality=quality)
+        total_bytes += os.path.getsize(path)
+
+    with open(os.path.join(ann_dir, f"{name}.txt"), 'w') as f:
+        f.writelines(lines)
+    return frames, total_bytes
+
+
+def generate_dataset(out_dir, train_sequences=4, val_sequences=2, frames=100, width=1344, height=756,
+                     boxes=30, seed=0, workers=None):
+    """Синтетические VisDrone2019-VID-{train,val} в out_dir; последовательности пишутся параллельно"""
+    jobs = []
+    for split, count in (('train', train_sequences), ('val', val_sequences)):
+        for i in range(count):
+            name = f"uav{i:07d}_{split}_synth"
+            jobs.append((out_dir, split, name, frames, width, height, boxes, seed * 1000 + len(jobs)))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(generate_sequence, *zip(*jobs)))
+    return sum(r[0] for r in results), sum(r[1] for r in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Генератор синтетических данных в формате VisDrone-VID')
+    parser.add_argument('--out', type=str, required=True,
+                        help='Папка, в которой будут созданы VisDrone2019-VID-train и VisDrone2019-VID-val')
+    parser.add_argument('--train-sequences', type=int, default=4,
+                        help='Последовательностей в train')
+    parser.add_argument('--val-sequences', type=int, default=2,
+                        help='Последовательностей в val')
+    parser.add_argument('--frames', type=int, default=100,
+                        help='Кадров в последовательности')
+    parser.add_argument('--width', type=int, default=1344,
+                        help='Ширина кадра')
+    parser.add_argument('--height', type=int, default=756,
+                        help='Высота кадра')
+    parser.add_argument('--boxes', type=int, default=30,
+                        help='Объектов в кадре')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed генерации')
+    args = parser.parse_args(argv)
+
+    print("🧪 === ГЕНЕРАЦИЯ СИНТЕТИЧЕСКОГО VISDRONE ===")
+    print("=" * 50)
+    frames, size = generate_dataset(args.out, args.train_sequences, args.val_sequences, args.frames,
+                                    args.width, args.height, args.boxes, args.seed)
+    print(f"✅ Кадров: {frames}, объем: {size / 1024 ** 2:.1f} МБ")
+    print(f"📁 Данные: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+
+from detection_cache import STALE_TMP_SECONDS, DetectionCache
+
+
+def save_entry(cache, key, n=200):
+    rng = np.random.default_rng(0)
+    return cache.save(key, ['0000001.jpg'], np.zeros(n), rng.uniform(0, 100, (n, 4)), rng.uniform(0, 1, n),
+                      np.zeros(n), {0: 'pedestrian'})
+
+
+def set_age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_round_trip(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    save_entry(cache, 'a')
+    entry = cache.load('a')
+    assert entry['boxes'].shape == (200, 4)
+    assert cache.load('missing') is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DetectionCache(str(tmp_path), max_size_mb=1)
+    for key, age in (('old', 300), ('used', 200)):
+        set_age(save_entry(cache, key), age)
+    # Чтение обновляет время использования: 'used' становится самой свежей записью
+    cache.load('used')
+
+    size = os.path.getsize(cache.path('old'))
+    cache.max_size = 2 * size + size // 2
+    save_entry(cache, 'new')
+
+    assert not os.path.exists(cache.path('old'))
+    assert os.path.exists(cache.path('used'))
+    assert os.path.exists(cache.path('new'))
+
+
+def test_corrupt_entry_is_a_miss_and_removed(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    with open(cache.path('bad'), 'wb') as f:
+        f.write(b'not a zip file')
+    assert cache.load('bad') is None
+    assert not os.path.exists(cache.path('bad'))
+
+
+def test_stale_tmp_removed_fresh_tmp_kept(tmp_path):
+    cache = DetectionCache(str(tmp_path))
+    stale = cache.path('stale') + '.tmp'
+    fresh = cache.path('fresh') + '.tmp'
+    for path in (stale, fresh):
+        with open(path, 'wb') as f:
+            f.write(b'\0' * 1024)
+    set_age(stale, STALE_TMP_SECONDS + 60)
+
+    cache.evict()
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from evaluate_detections import compute_ap, evaluate, evaluate_frame, match_detections
+
+
+def make_gt(boxes):
+    """Строки VisDrone: frame, id, x, y, w, h, score, category, trunc, occl"""
+    return np.array([[1, i, x, y, w, h, 1, cat, 0, 0] for i, (x, y, w, h, cat) in enumerate(boxes)],
+                    dtype=np.float64)
+
+
+def test_ap_perfect_detector():
+    assert compute_ap([0.5, 1.0], [1.0, 1.0]) == 1.0
+
+
+def test_ap_detector_stops_at_half_recall():
+    assert abs(compute_ap([0.25, 0.5], [1.0, 1.0]) - 51 / 101) < 1e-9
+
+
+def test_gt_as_predictions_gives_map_one():
+    gt = make_gt([(10, 10, 20, 20, 4), (50, 50, 30, 20, 1), (100, 20, 15, 15, 4)])
+    metrics = evaluate({"seq": gt}, {"seq": gt})
+    assert np.isclose(metrics["mAP50"], 1.0)
+    assert np.isclose(metrics["mAP50-95"], 1.0)
+
+
+def test_match_falls_back_to_second_best_gt():
+    iou = np.array([[0.8, 0.0], [0.9, 0.85]])
+    tp = match_detections(np.array([1, 1]), np.array([1, 1]), iou, iou_thresholds=np.array([0.5]))
+    assert tp[:, 0].tolist() == [True, True]
+
+
+def test_match_thresholds_are_independent():
+    # На пороге 0.5 первая детекция занимает объект, на 0.75 она не проходит и объект достается второй
+    iou = np.array([[0.6], [0.9]])
+    tp = match_detections(np.array([1, 1]), np.array([1]), iou, iou_thresholds=np.array([0.5, 0.75]))
+    assert tp.tolist() == [[True, False], [False, True]]
+
+
+def test_match_ignores_other_class():
+    tp = match_detections(np.array([2]), np.array([1]), np.array([[0.95]]), iou_thresholds=np.array([0.5]))
+    assert not tp.any()
+
+
+def test_ignored_region_drops_predictions_and_gt():
+    # Категория 0 - игнорируемая область: объект и детекция внутри нее не учитываются
+    gt = make_gt([(10, 10, 20, 20, 4), (200, 200, 100, 100, 0), (220, 220, 20, 20, 4)])
+    pred = make_gt([(10, 10, 20, 20, 4), (250, 250, 30, 30, 1)])
+    tp, conf, pred_cls, gt_cls = evaluate_frame(pred, gt)
+    assert gt_cls.tolist() == [4]
+    assert pred_cls.tolist() == [4]
+    assert tp.all()
+
+    metrics = evaluate({"seq": pred}, {"seq": gt})
+    assert np.isclose(metrics["mAP50-95"], 1.0)
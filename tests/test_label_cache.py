@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from label_cache import build_label_cache, cache_version, get_hash, label_cache_is_fresh, split_files
+
+
+def make_split(root, frames):
+    """data/<split>: images/<имя>.jpg заданного размера и labels/<имя>.txt (None - без файла меток)"""
+    os.makedirs(os.path.join(root, 'images'))
+    os.makedirs(os.path.join(root, 'labels'))
+    for name, (w, h), text in frames:
+        Image.new('RGB', (w, h)).save(os.path.join(root, 'images', f'{name}.jpg'))
+        if text is not None:
+            with open(os.path.join(root, 'labels', f'{name}.txt'), 'w') as f:
+                f.write(text)
+
+
+def test_build_label_cache_round_trip(tmp_path):
+    split_dir = str(tmp_path / 'train')
+    make_split(split_dir, [
+        ('a', (64, 48), "3 0.5 0.5 0.2 0.1\n0 0.1 0.1 0.05 0.05\n"),
+        ('b', (32, 32), ""),
+        ('c', (32, 32), None),
+    ])
+
+    path, results = build_label_cache(split_dir)
+    assert results == (1, 1, 1, 0, 3)
+
+    cache = np.load(path, allow_pickle=True).item()
+    im_files, label_files = split_files(split_dir)
+    assert cache["version"] == cache_version()
+    assert cache["hash"] == get_hash(label_files + im_files)
+    assert [label["im_file"] for label in cache["labels"]] == im_files
+
+    first = cache["labels"][0]
+    assert first["shape"] == (48, 64)
+    assert first["cls"].ravel().tolist() == [3, 0]
+    assert first["bboxes"].shape == (2, 4)
+
+
+def test_label_cache_goes_stale_when_labels_change(tmp_path):
+    split_dir = str(tmp_path / 'train')
+    make_split(split_dir, [('a', (32, 32), "1 0.5 0.5 0.2 0.2\n")])
+    build_label_cache(split_dir)
+    assert label_cache_is_fresh(split_dir)
+
+    with open(os.path.join(split_dir, 'labels', 'a.txt'), 'a') as f:
+        f.write("2 0.3 0.3 0.1 0.1\n")
+    assert not label_cache_is_fresh(split_dir)
+
+
+def test_known_frames_are_not_read_again(tmp_path):
+    split_dir = str(tmp_path / 'train')
+    make_split(split_dir, [('a', (32, 32), "1 0.5 0.5 0.2 0.2\n")])
+    im_file = split_files(split_dir)[0][0]
+    known = {im_file: ((720, 1280), np.array([[4, 0.5, 0.5, 0.1, 0.1]], dtype=np.float32))}
+
+    path, _ = build_label_cache(split_dir, known)
+    label = np.load(path, allow_pickle=True).item()["labels"][0]
+    assert label["shape"] == (720, 1280)
+    assert label["cls"].ravel().tolist() == [4]
@@ -0,0 +1,76 @@
+import os
+
+from pipeline import PipelineRunner, Stage, path_fingerprint
+
+
+def write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def make_stages(tmp_path, calls, params=None):
+    """Стадия copy: input.txt -> output.txt, и зависящая от нее стадия report"""
+    src, dst = str(tmp_path / 'input.txt'), str(tmp_path / 'output.txt')
+
+    def copy():
+        calls.append('copy')
+        with open(src) as f:
+            write(dst, f.read())
+
+    def report():
+        calls.append('report')
+
+    return [
+        Stage('copy', copy, inputs=[src], outputs=[dst], params=params or {}),
+        Stage('report', report, inputs=[dst], deps=['copy']),
+    ]
+
+
+def run(tmp_path, calls, **kwargs):
+    params = kwargs.pop('params', None)
+    return PipelineRunner(make_stages(tmp_path, calls, params), str(tmp_path / 'runs'), **kwargs).run()
+
+
+def test_fingerprint_tracks_size_and_mtime(tmp_path):
+    path = str(tmp_path / 'a.txt')
+    write(path, 'abc')
+    before = path_fingerprint(path)
+    assert before["files"] == 1 and before["bytes"] == 3
+
+    os.utime(path, ns=(0, 0))
+    assert path_fingerprint(path)["hash"] != before["hash"]
+    assert path_fingerprint(str(tmp_path / 'missing'))["hash"] is None
+
+
+def test_second_run_is_skipped(tmp_path):
+    write(str(tmp_path / 'input.txt'), 'v1')
+    calls = []
+    assert run(tmp_path, calls) == {"copy": "ran", "report": "ran"}
+    assert run(tmp_path, calls) == {"copy": "skipped", "report": "skipped"}
+    assert calls == ['copy', 'report']
+
+
+def test_changed_input_params_or_output_rerun(tmp_path):
+    src = str(tmp_path / 'input.txt')
+    write(src, 'v1')
+    calls = []
+    run(tmp_path, calls)
+
+    write(src, 'version 2')
+    assert run(tmp_path, calls)["copy"] == "ran"
+
+    assert run(tmp_path, calls, params={"mode": "fast"})["copy"] == "ran"
+
+    write(str(tmp_path / 'output.txt'), 'edited by hand')
+    assert run(tmp_path, calls, params={"mode": "fast"})["copy"] == "ran"
+
+    assert run(tmp_path, calls, params={"mode": "fast"}, force=True)["copy"] == "ran"
+
+
+def test_failed_stage_blocks_dependents_and_is_not_recorded(tmp_path):
+    calls = []
+    # input.txt нет - copy падает, report не запускается
+    assert run(tmp_path, calls) == {"copy": "failed", "report": "blocked"}
+
+    write(str(tmp_path / 'input.txt'), 'v1')
+    assert run(tmp_path, calls) == {"copy": "ran", "report": "ran"}
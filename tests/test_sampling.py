@@ -0,0 +1,46 @@
+import numpy as np
+
+from sampling import HardExampleTracker, WeightedSampler, class_balanced_weights, histograms_from_classes
+
+
+def test_rare_class_frames_get_higher_weight():
+    # Кадры 0-2 только с car (3), кадр 3 с bicycle (2), кадр 4 пустой
+    hist = histograms_from_classes([[3, 3], [3], [3, 3, 3], [2, 3], []])
+    weights = class_balanced_weights(hist, power=1.0)
+
+    assert np.isclose(weights.mean(), 1.0)
+    assert weights[3] > weights[0]
+    assert np.isclose(weights[0], weights[1]) and np.isclose(weights[1], weights[2])
+    # Пустой кадр - минимальный вес среди кадров с объектами
+    assert np.isclose(weights[4], weights[:3].min())
+
+
+def test_zero_power_is_uniform():
+    hist = histograms_from_classes([[3], [2], [3, 3, 1]])
+    assert np.allclose(class_balanced_weights(hist, power=0.0), 1.0)
+
+
+def test_hard_tracker_uses_per_image_loss():
+    tracker = HardExampleTracker(3, momentum=0.5)
+    tracker.update([0, 1], np.array([1.0, 3.0]))
+    tracker.update([0], np.array([3.0]))
+    assert np.allclose(tracker.loss[:2], [2.0, 3.0])
+
+    factors = tracker.factors()
+    assert factors[1] > factors[0]
+    # Кадр без loss остается с множителем 1
+    assert factors[2] == 1.0
+
+
+def test_sampler_applies_new_weights_within_epoch():
+    sampler = WeightedSampler(np.ones(100), chunk=10)
+    it = iter(sampler)
+    drawn = [next(it) for _ in range(5)]
+
+    weights = np.zeros(100)
+    weights[7] = 1.0
+    sampler.set_weights(weights)
+    drawn += list(it)
+
+    assert len(drawn) == 100
+    assert set(drawn[10:]) == {7}
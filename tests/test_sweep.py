@@ -0,0 +1,38 @@
+from sweep import ASHA
+
+
+def new_trial():
+    return {"rungs": {}}
+
+
+def test_rungs():
+    assert ASHA(min_epochs=1, max_epochs=27, eta=3).rungs == [1, 3, 9]
+    assert ASHA(min_epochs=3, max_epochs=3, eta=3).rungs == []
+
+
+def test_prunes_below_quantile_and_promotes_best():
+    asha = ASHA(min_epochs=2, max_epochs=10, eta=3)
+    first, weak, strong = new_trial(), new_trial(), new_trial()
+
+    # Первое испытание на ступени всегда продолжается
+    assert asha.on_result(first, [0.1, 0.5])
+    assert first["rungs"] == {2: 0.5}
+    # Ниже (1 - 1/eta)-квантиля уже записанных - остановка
+    assert not asha.on_result(weak, [0.2, 0.3])
+    assert asha.on_result(strong, [0.4, 0.6])
+
+
+def test_rung_recorded_once_and_not_before_reached():
+    asha = ASHA(min_epochs=2, max_epochs=10, eta=3)
+    trial = new_trial()
+
+    assert asha.on_result(trial, [0.5])
+    assert trial["rungs"] == {}
+
+    asha.on_result(trial, [0.5, 0.6])
+    asha.on_result(trial, [0.5, 0.6, 0.7])
+    assert asha.recorded[2] == [0.6]
+
+    # Следующая ступень (6 эпох) оценивается по лучшему значению до нее
+    asha.on_result(trial, [0.5, 0.6, 0.7, 0.9, 0.8, 0.8])
+    assert trial["rungs"] == {2: 0.6, 6: 0.9}
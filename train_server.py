@@ -1,12 +1,82 @@
 import os
-import torch
-from ultralytics import YOLO
-import yaml
-from tqdm import tqdm
+import sys
+import ast
 import time
+import argparse
+
+from config import get_base_dir
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Обучение YOLO на подготовленных данных')
+    parser.add_argument('--epochs', type=int, default=50,
+                        help='Число эпох')
+    parser.add_argument('--imgsz', type=int, default=640,
+                        help='Размер входа модели')
+    parser.add_argument('--batch', type=int, default=16,
+                        help='Размер батча')
+    parser.add_argument('--device', type=str, default=None,
+                        help='Устройство (cpu, 0, 0,1); по умолчанию cuda при наличии')
+    parser.add_argument('--project', type=str, default=None,
+                        help='Папка для результатов (по умолчанию BASE_DIR/results)')
+    parser.add_argument('--name', type=str, default='yolo_training',
+                        help='Имя запуска в папке results')
+    parser.add_argument('--exist-ok', action='store_true',
+                        help='Писать в существующую папку запуска вместо создания name2, name3, ...')
+    parser.add_argument('--patience', type=int, default=10,
+                        help='Остановка, если mAP не растет столько эпох (0 - без ранней остановки)')
+    parser.add_argument('--sampling', choices=['uniform', 'balanced'], default='uniform',
+                        help='Выборка кадров: равномерная или сбалансированная по классам')
+    parser.add_argument('--balance-power', type=float, default=0.5,
+                        help='Сила балансировки классов (0..1)')
+    parser.add_argument('--hard-weight', type=float, default=0.0,
+                        help='Смещение выборки к кадрам с большим loss прошлых эпох (0 - выключено)')
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='KEY=VALUE',
+                        help='Дополнительный аргумент model.train, например --set lr0=0.005 --set mosaic=0.5')
+    return parser
+
+
+# Аргументы model.train, которые train_server.py задает сам; через --set их передавать нельзя
+RESERVED_TRAIN_KEYS = {'trainer', 'data', 'epochs', 'imgsz', 'batch', 'device', 'patience', 'save',
+                       'project', 'name', 'exist_ok', 'verbose'}
+
+
+def parse_overrides(items):
+    """Разбирает список KEY=VALUE в словарь с числами/булевыми значениями где возможно"""
+    overrides = {}
+    for item in items:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"ожидается KEY=VALUE: {item}")
+        if key.strip() in RESERVED_TRAIN_KEYS:
+            raise ValueError(f"{key.strip()} задается отдельным аргументом train_server.py, а не через --set")
+        try:
+            overrides[key.strip()] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            overrides[key.strip()] = value
+    return overrides
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        overrides = parse_overrides(args.overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    # При нескольких GPU ultralytics запускает DDP в отдельном процессе и импортирует тренер
+    # по имени модуля; тренер с выборкой по весам создается фабрикой и так не импортируется
+    devices = [d for d in (args.device or '').strip('[]').split(',') if d.strip()]
+    if len(devices) > 1 and (args.sampling != 'uniform' or args.hard_weight > 0):
+        parser.error("--sampling balanced и --hard-weight поддерживаются только на одном устройстве")
+
+    # Тяжелые библиотеки импортируются только при запуске обучения
+    import torch
+    import yaml
+    from tqdm import tqdm
+    from ultralytics import YOLO
 
-
-def main():
     print("🚀 === ОБУЧЕНИЕ YOLO МОДЕЛИ НА СЕРВЕРЕ ===")
     print("=" * 50)
 
@@ -19,7 +89,7 @@ def main():
         print("⚠️  CUDA недоступен, используется CPU")
 
     # Базовая директория на сервере
-    BASE_DIR = os.path.expanduser('~/Bespilot_lopatinBeglov')
+    BASE_DIR = get_base_dir()
     DATA_DIR = os.path.join(BASE_DIR, 'data')
     YAML_PATH = os.path.join(DATA_DIR, 'data.yaml')
 
@@ -34,7 +104,7 @@ def main():
         if not os.path.exists(YAML_PATH):
             print(f"❌ Ошибка: файл {YAML_PATH} не найден!")
             print("💡 Сначала запустите prepare_server_dataset.py")
-            return
+            return 1
         pbar.update(1)
 
         # Загружаем YAML для проверки
@@ -43,6 +113,8 @@ def main():
 
         train_path = os.path.join(DATA_DIR, data_config['train'])
         val_path = os.path.join(DATA_DIR, data_config['val'])
+        train_labels_path = os.path.join(DATA_DIR, 'train', 'labels')
+        val_labels_path = os.path.join(DATA_DIR, 'val', 'labels')
 
         if not os.path.exists(val_path) or len(os.listdir(val_path)) == 0:
             print("⚠️ Валидационные данные отсутствуют, используем тренировочные для валидации")
@@ -51,21 +123,18 @@ def main():
 
         if not os.path.exists(train_path):
             print(f"❌ Ошибка: папка с обучающими данными не найдена: {train_path}")
-            return
+            return 1
         pbar.update(1)
 
         if not os.path.exists(val_path):
             print(f"❌ Ошибка: папка с валидационными данными не найдена: {val_path}")
-            return
+            return 1
         pbar.update(1)
 
         # Проверяем наличие аннотаций
-        train_labels_path = os.path.join(DATA_DIR, 'train', 'labels')
-        val_labels_path = os.path.join(DATA_DIR, 'val', 'labels')
-
         if not os.path.exists(train_labels_path):
             print(f"❌ Ошибка: папка с обучающими аннотациями не найдена: {train_labels_path}")
-            return
+            return 1
         pbar.update(1)
 
     print("✅ Все файлы найдены!")
@@ -98,11 +167,20 @@ def main():
     if train_images == 0:
         print("❌ Ошибка: нет обучающих изображений!")
         print("💡 Сначала запустите prepare_server_dataset.py")
-        return
+        return 1
 
     if train_labels == 0:
         print("❌ Ошибка: нет обучающих аннотаций!")
-        return
+        return 1
+
+    # labels.cache пишет prepare_server_dataset.py; если данные менялись после него, кэш перестраивается
+    # здесь параллельно, чтобы ultralytics не сканировал кадры заново
+    from label_cache import ensure_label_cache
+    for split_dir in sorted({os.path.dirname(train_path), os.path.dirname(val_path)}):
+        if ensure_label_cache(split_dir):
+            print(f"🗂️  labels.cache устарел и перестроен: {split_dir}")
+        else:
+            print(f"🗂️  labels.cache актуален: {split_dir}")
 
     # Инициализируем модель
     print("\n🤖 Загрузка модели YOLOv8...")
@@ -111,27 +189,37 @@ def main():
         pbar.update(1)
 
     # Создаем папку для результатов
-    results_dir = os.path.join(BASE_DIR, 'results')
+    results_dir = args.project or os.path.join(BASE_DIR, 'results')
     os.makedirs(results_dir, exist_ok=True)
 
     # Обучаем модель
     print("\n🎯 Начинаем обучение...")
     print("=" * 50)
 
+    # Выборка кадров: стандартный тренер ultralytics или тренер с весами кадров
+    trainer = None
+    if args.sampling != 'uniform' or args.hard_weight > 0:
+        from sampling import make_trainer_class
+        trainer = make_trainer_class(args.sampling, args.balance_power, args.hard_weight)
+        print(f"⚖️  Выборка кадров: {args.sampling}, hard examples: {args.hard_weight}")
+
     start_time = time.time()
 
     try:
         results = model.train(
+            trainer=trainer,
             data=YAML_PATH,
-            epochs=50,
-            imgsz=640,
-            batch=16,
-            device="cuda" if torch.cuda.is_available() else "cpu",
-            patience=10,  # Остановка если нет улучшений
+            epochs=args.epochs,
+            imgsz=args.imgsz,
+            batch=args.batch,
+            device=args.device or ("cuda" if torch.cuda.is_available() else "cpu"),
+            patience=args.patience,  # Остановка если нет улучшений
             save=True,
             project=results_dir,
-            name="yolo_training",
-            verbose=True
+            name=args.name,
+            exist_ok=args.exist_ok,
+            verbose=True,
+            **overrides
         )
 
         end_time = time.time()
@@ -163,8 +251,10 @@ def main():
 
     except Exception as e:
         print(f"\n❌ Ошибка во время обучения: {e}")
-        return
+        return 1
+
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -1,44 +1,232 @@
 import os
-import cv2
-import torch
-import numpy as np
-from ultralytics import YOLO
-from tqdm import tqdm
 import argparse
 import shutil
+import time
 
+from config import get_base_dir
 
-def main():
-    print("🚀 === ВИЗУАЛИЗАЦИЯ РЕЗУЛЬТАТОВ НА ВАЛИДАЦИОННЫХ ДАННЫХ ===")
+# cv2, torch, numpy и ultralytics импортируются внутри функций,
+# чтобы разбор аргументов и --help не ждали загрузки тяжелых библиотек
+
+
+def draw_detections(frame, boxes, classes, confidences, names):
+    """Рисует детекции на кадре зеленой окантовкой с подписью класса и уверенности"""
+    import cv2
+
+    for box, cls_id, conf in zip(boxes, classes, confidences):
+        x1, y1, x2, y2 = map(int, box)
+
+        # Рисуем зеленый прямоугольник
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+        # Подпись с классом и уверенностью
+        label = f"{names[int(cls_id)]} {conf:.2f}"
+        cv2.putText(frame, label, (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+
+def predict_frame(model, frame, profiler, **kwargs):
+    """
+    Детекция одного кадра. При включенном профилировании время predict()
+    раскладывается на этапы по results.speed (preprocess / forward / NMS)
+    """
+    start = time.perf_counter()
+    results = model.predict(source=frame, verbose=False, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    if profiler.enabled:
+        speed = results[0].speed
+        stages = [(stage, (speed.get(key) or 0.0) / 1000.0)
+                  for stage, key in (("preprocess", "preprocess"), ("forward", "inference"), ("nms", "postprocess"))]
+        # Остаток времени predict() - накладные расходы ultralytics до этапов
+        t = start + max(elapsed - sum(d for _, d in stages), 0.0)
+        profiler.add("predict_overhead", start, t - start)
+        for stage, duration in stages:
+            profiler.add(stage, t, duration)
+            t += duration
+
+    with profiler.stage("to_numpy"):
+        boxes = results[0].boxes.xyxy.cpu().numpy()
+        classes = results[0].boxes.cls.cpu().numpy()
+        confidences = results[0].boxes.conf.cpu().numpy()
+    return boxes, classes, confidences
+
+
+def save_profile(profiler, results_dir, name):
+    """Печатает сводку по этапам и сохраняет CSV и Chrome trace"""
+    if not profiler.enabled:
+        return
+    print("\n⏱️  Профиль этапов обработки:")
+    profiler.print_summary()
+
+    summary_path = os.path.join(results_dir, f"{name}_profile.csv")
+    trace_path = os.path.join(results_dir, f"{name}_trace.json")
+    profiler.save_summary(summary_path)
+    profiler.save_chrome_trace(trace_path)
+    print(f"💾 Сводка: {summary_path}")
+    print(f"💾 Chrome trace: {trace_path} (откройте в chrome://tracing или ui.perfetto.dev)")
+
+
+def run_stream(args, model_path, results_dir, profiler):
+    """
+    Обработка видеофайла, камеры или URL потока через cv2.VideoCapture.
+    Кадры читаются в ограниченную очередь и сразу пишутся в видео сравнения,
+    поэтому память не растет с длиной потока
+    """
+    import cv2
+    import torch
+    import numpy as np
+    from tqdm import tqdm
+    from ultralytics import YOLO
+    from video_stream import open_capture, FrameReader
+
+    capture = open_capture(args.source)
+    if not capture.isOpened():
+        print(f"❌ Ошибка: не удалось открыть источник: {args.source}")
+        return
+
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    out_fps = source_fps if source_fps > 0 else args.fps
+
+    print(f"\n📹 Источник: {args.source}")
+    print(f"  FPS источника: {source_fps:.1f}" if source_fps > 0 else "  FPS источника: неизвестно")
+    print(f"  Сброс кадров: {'включен' if args.drop_frames else 'выключен'}")
+    print(f"  Порог уверенности: {args.conf}")
+
+    # Проверка CUDA
+    print("\n🔍 Проверка оборудования...")
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Используемое устройство: {device.upper()}")
+
+    print("\n🤖 Загрузка модели YOLO...")
+    model = YOLO(model_path)
+    print(f"✅ Модель загружена: {os.path.basename(model_path)}")
+
+    name = os.path.splitext(os.path.basename(str(args.source)))[0] or 'stream'
+    combined_video = os.path.join(results_dir, f"{name}_comparison.mp4")
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    # VideoWriter создается по первому кадру: не все потоки сообщают разрешение заранее
+    combined_out = None
+
+    pace_fps = source_fps if args.simulate_live else 0.0
+    reader = FrameReader(capture, args.queue_size, args.drop_frames, pace_fps).start()
+    progress_bar = tqdm(total=total_frames if total_frames > 0 else None, desc="Обработка кадров", unit="кадр")
+
+    processed = 0
+    start_time = time.perf_counter()
+    frames = iter(reader)
+    try:
+        while True:
+            with profiler.stage("read_wait"):
+                item = next(frames, None)
+            if item is None:
+                break
+            profiler.frame_index, _, frame = item
+
+            boxes, classes, confidences = predict_frame(model, frame, profiler, conf=args.conf, device=device)
+
+            if combined_out is None:
+                height, width = frame.shape[:2]
+                combined_out = cv2.VideoWriter(combined_video, fourcc, out_fps, (width * 2, height))
+                print(f"  Разрешение: {width}x{height}")
+
+            with profiler.stage("draw"):
+                detected = frame.copy()
+                draw_detections(detected, boxes, classes, confidences, model.names)
+
+                combined_frame = np.hstack((frame, detected))
+                cv2.putText(combined_frame, "Original", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                cv2.putText(combined_frame, "Detection", (width + 10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+            with profiler.stage("write"):
+                combined_out.write(combined_frame)
+
+            processed += 1
+            progress_bar.update(1)
+            if args.max_frames and processed >= args.max_frames:
+                break
+    except KeyboardInterrupt:
+        print("\n🛑 Остановлено пользователем")
+    finally:
+        elapsed = time.perf_counter() - start_time
+        reader.stop()
+        progress_bar.close()
+        capture.release()
+        if combined_out is not None:
+            combined_out.release()
+
+    achieved_fps = processed / elapsed if elapsed > 0 else 0.0
+
+    print("\n" + "=" * 60)
+    print("🎉 ОБРАБОТКА ПОТОКА ЗАВЕРШЕНА")
     print("=" * 60)
+    print(f"💾 Видео сохранено в: {combined_video}")
+    print(f"📊 Прочитано кадров: {reader.read_count}, обработано: {processed}, сброшено: {reader.dropped}")
+    print(f"🚀 Достигнутый FPS: {achieved_fps:.1f}")
+    if source_fps > 0:
+        print(f"🎥 FPS источника: {source_fps:.1f} ({achieved_fps / source_fps * 100:.0f}% от реального времени)")
 
-    # Парсинг аргументов
+    save_profile(profiler, results_dir, name)
+
+
+def build_parser():
     parser = argparse.ArgumentParser(description='Визуализация результатов детекции')
-    parser.add_argument('--sequence', type=str, required=True,
+    parser.add_argument('--sequence', type=str, default=None,
                         help='Название последовательности (например uav0000086_00000_v)')
+    parser.add_argument('--source', type=str, default=None,
+                        help='Видеофайл, номер камеры или URL потока вместо --sequence')
+    parser.add_argument('--drop-frames', action='store_true',
+                        help='Сбрасывать старые кадры, если обработка не успевает за потоком')
+    parser.add_argument('--simulate-live', action='store_true',
+                        help='Читать видеофайл со скоростью его FPS, как живую камеру')
+    parser.add_argument('--queue-size', type=int, default=8,
+                        help='Размер очереди кадров при чтении потока')
+    parser.add_argument('--max-frames', type=int, default=0,
+                        help='Остановиться после указанного числа кадров (0 - до конца потока)')
     parser.add_argument('--model', type=str, default='best.pt',
                         help='Путь к модели YOLO')
     parser.add_argument('--conf', type=float, default=0.3,
                         help='Порог уверенности для детекции')
     parser.add_argument('--fps', type=int, default=30,
                         help='Частота кадров для видео')
-    args = parser.parse_args()
+    parser.add_argument('--save-predictions', type=str, default=None,
+                        help='Папка для сохранения предсказаний в формате VisDrone (для evaluate_detections.py)')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Папка кэша детекций (по умолчанию BASE_DIR/cache/detections)')
+    parser.add_argument('--cache-size-mb', type=float, default=2048,
+                        help='Максимальный размер кэша детекций, МБ')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Не использовать кэш детекций')
+    parser.add_argument('--profile', action='store_true',
+                        help='Замерить время этапов каждого кадра (сводка + Chrome trace); кэш не читается')
+    return parser
+
+
+def main(argv=None):
+    # Парсинг аргументов
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if (args.sequence is None) == (args.source is None):
+        parser.error('укажите ровно один из аргументов --sequence или --source')
+
+    print("🚀 === ВИЗУАЛИЗАЦИЯ РЕЗУЛЬТАТОВ НА ВАЛИДАЦИОННЫХ ДАННЫХ ===")
+    print("=" * 60)
+
+    from stage_profiler import StageProfiler, NullProfiler
 
     # Базовые пути
-    BASE_DIR = os.path.expanduser('~/Bespilot_lopatinBeglov')
+    BASE_DIR = get_base_dir()
     VAL_DIR = os.path.join(BASE_DIR, 'VisDrone2019-VID-val')
     RESULTS_DIR = os.path.join(BASE_DIR, 'validation_results')
 
     # Создаем рабочую директорию
     os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    # Проверка CUDA
-    print("\n🔍 Проверка оборудования...")
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"Используемое устройство: {device.upper()}")
-
-    # Загрузка модели
-    print("\n🤖 Загрузка модели YOLO...")
+    # Поиск модели
     model_path = os.path.join(BASE_DIR, 'results', 'yolo_training2', 'weights', args.model)
 
     if not os.path.exists(model_path):
@@ -48,8 +236,19 @@ def main():
             print(f"❌ Ошибка: модель не найдена: {args.model}")
             return
 
-    model = YOLO(model_path)
-    print(f"✅ Модель загружена: {os.path.basename(model_path)}")
+    profiler = StageProfiler() if args.profile else NullProfiler()
+
+    if args.source is not None:
+        run_stream(args, model_path, RESULTS_DIR, profiler)
+        return
+
+    import cv2
+    import torch
+    import numpy as np
+    from tqdm import tqdm
+    from ultralytics import YOLO
+    from detection_cache import (DetectionCache, DEFAULT_CONF_FLOOR, file_hash, cache_key,
+                                 cached_names, frame_detections)
 
     # Пути к данным
     seq_path = os.path.join(VAL_DIR, 'sequences', args.sequence)
@@ -70,6 +269,39 @@ def main():
     print(f"  FPS: {args.fps}")
     print(f"  Порог уверенности: {args.conf}")
 
+    # Кэш детекций: инференс выполняется один раз с низким порогом,
+    # повторные запуски с другими --conf/--fps только фильтруют сохраненные боксы
+    cache = None
+    cached = None
+    image_paths = [os.path.join(seq_path, img_name) for img_name in images]
+    conf_floor = min(DEFAULT_CONF_FLOOR, args.conf)
+
+    if not args.no_cache:
+        cache = DetectionCache(args.cache_dir or os.path.join(BASE_DIR, 'cache', 'detections'),
+                               args.cache_size_mb)
+        key = cache_key(file_hash(model_path), image_paths, {"conf_floor": conf_floor, "imgsz": 640})
+        # При профилировании нужен настоящий инференс, поэтому кэш только пополняется
+        cached = None if args.profile else cache.load(key)
+
+    if cached is not None:
+        print(f"\n⚡ Детекции найдены в кэше: {cache.path(key)}")
+        names = cached_names(cached)
+        detections = frame_detections(cached, args.conf)
+    else:
+        # Проверка CUDA
+        print("\n🔍 Проверка оборудования...")
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"Используемое устройство: {device.upper()}")
+
+        # Загрузка модели
+        print("\n🤖 Загрузка модели YOLO...")
+        model = YOLO(model_path)
+        names = model.names
+        print(f"✅ Модель загружена: {os.path.basename(model_path)}")
+
+        # Накопители для записи в кэш
+        cache_idx, cache_boxes, cache_conf, cache_cls = [], [], [], []
+
     # Определяем размер видео по первому изображению
     first_image = cv2.imread(os.path.join(seq_path, images[0]))
     height, width, _ = first_image.shape
@@ -79,54 +311,83 @@ def main():
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_video, fourcc, args.fps, (width, height))
 
+    # Предсказания в формате VisDrone: frame, -1, x, y, w, h, score, category, -1, -1
+    pred_lines = []
+
     # Обработка кадров с прогресс-баром
     print("\n🎬 Генерация видео с детекцией...")
     progress_bar = tqdm(images, desc="Обработка кадров", unit="кадр")
 
-    for img_name in progress_bar:
-        img_path = os.path.join(seq_path, img_name)
-        frame = cv2.imread(img_path)
-
-        # Выполняем детекцию
-        results = model.predict(
-            source=frame,
-            conf=args.conf,
-            device=device,
-            verbose=False
-        )
-
-        # Получаем результаты детекции
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        classes = results[0].boxes.cls.cpu().numpy()
-        confidences = results[0].boxes.conf.cpu().numpy()
+    for i, img_name in enumerate(progress_bar):
+        profiler.frame_index = i
+        img_path = image_paths[i]
+        with profiler.stage("imread"):
+            frame = cv2.imread(img_path)
+
+        if cached is not None:
+            boxes, confidences, classes = detections[i]
+        else:
+            # Выполняем детекцию
+            boxes, classes, confidences = predict_frame(model, frame, profiler,
+                                                        conf=conf_floor, imgsz=640, device=device)
+
+            if cache is not None:
+                cache_idx.append(np.full(len(boxes), i, dtype=np.int32))
+                cache_boxes.append(boxes)
+                cache_conf.append(confidences)
+                cache_cls.append(classes)
+
+            # Для отрисовки оставляем только детекции выше порога
+            keep = confidences >= args.conf
+            boxes, classes, confidences = boxes[keep], classes[keep], confidences[keep]
+
+        if args.save_predictions:
+            frame_id = int(os.path.splitext(img_name)[0])
+            for box, cls_id, conf in zip(boxes, classes, confidences):
+                x1, y1, x2, y2 = box
+                # Классы YOLO 0..9 -> категории VisDrone 1..10
+                pred_lines.append(f"{frame_id},-1,{x1:.1f},{y1:.1f},{x2 - x1:.1f},{y2 - y1:.1f},"
+                                  f"{conf:.4f},{int(cls_id) + 1},-1,-1\n")
 
         # Визуализируем результаты с зеленой окантовкой
-        for box, cls_id, conf in zip(boxes, classes, confidences):
-            x1, y1, x2, y2 = map(int, box)
-
-            # Рисуем зеленый прямоугольник
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-            # Подпись с классом и уверенностью
-            label = f"{model.names[int(cls_id)]} {conf:.2f}"
-            cv2.putText(frame, label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        with profiler.stage("draw"):
+            draw_detections(frame, boxes, classes, confidences, names)
 
         # Добавляем кадр в видео
-        out.write(frame)
+        with profiler.stage("write"):
+            out.write(frame)
 
     out.release()
     progress_bar.close()
 
+    if cache is not None and cached is None:
+        cache_file = cache.save(
+            key, images,
+            np.concatenate(cache_idx), np.concatenate(cache_boxes).reshape(-1, 4),
+            np.concatenate(cache_conf), np.concatenate(cache_cls),
+            {int(k): v for k, v in names.items()}, args.sequence
+        )
+        print(f"💾 Детекции сохранены в кэш: {cache_file}")
+
+    if args.save_predictions:
+        os.makedirs(args.save_predictions, exist_ok=True)
+        pred_file = os.path.join(args.save_predictions, f"{args.sequence}.txt")
+        with open(pred_file, 'w') as f:
+            f.writelines(pred_lines)
+        print(f"💾 Предсказания сохранены в: {pred_file}")
+
     # Создаем видео с оригинальными кадрами для сравнения
     print("\n🎬 Создание видео с оригинальными кадрами...")
     original_video = os.path.join(RESULTS_DIR, f"{args.sequence}_original.mp4")
     orig_out = cv2.VideoWriter(original_video, fourcc, args.fps, (width, height))
 
-    for img_name in tqdm(images, desc="Обработка оригиналов", unit="кадр"):
+    for i, img_name in enumerate(tqdm(images, desc="Обработка оригиналов", unit="кадр")):
+        profiler.frame_index = i
         img_path = os.path.join(seq_path, img_name)
-        frame = cv2.imread(img_path)
-        orig_out.write(frame)
+        with profiler.stage("orig_imread"):
+            frame = cv2.imread(img_path)
+        with profiler.stage("orig_write"):
+            orig_out.write(frame)
 
     orig_out.release()
 
@@ -143,9 +404,11 @@ def main():
     combined_out = cv2.VideoWriter(combined_video, fourcc, args.fps, (combined_width, height))
 
     frame_count = len(images)
-    for _ in tqdm(range(frame_count), desc="Комбинирование", unit="кадр"):
-        ret_orig, frame_orig = cap_orig.read()
-        ret_det, frame_det = cap_det.read()
+    for i in tqdm(range(frame_count), desc="Комбинирование", unit="кадр"):
+        profiler.frame_index = i
+        with profiler.stage("combine_decode"):
+            ret_orig, frame_orig = cap_orig.read()
+            ret_det, frame_det = cap_det.read()
 
         if not ret_orig or not ret_det:
             break
@@ -159,7 +422,8 @@ def main():
         cv2.putText(combined_frame, "Detection", (width + 10, 30),
                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
 
-        combined_out.write(combined_frame)
+        with profiler.stage("combine_write"):
+            combined_out.write(combined_frame)
 
     # Закрываем все ресурсы
     cap_orig.release()
@@ -179,6 +443,8 @@ def main():
     print(f"\n🖼️ Размер видео: {width * 2}x{height} (оригинал + детекция)")
     print(f"⏱️ Продолжительность: {frame_count / args.fps:.1f} секунд")
 
+    save_profile(profiler, RESULTS_DIR, args.sequence)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
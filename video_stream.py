@@ -0,0 +1,100 @@
+import time
+import queue
+import threading
+
+import cv2
+
+
+def open_capture(source):
+    """
+    Открывает источник cv2.VideoCapture: номер камеры ("0"), видеофайл или URL потока
+    """
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    return cv2.VideoCapture(source)
+
+
+class FrameReader:
+    """
+    Читает кадры из VideoCapture в отдельном потоке в ограниченную очередь.
+    Память постоянна: в очереди не больше queue_size кадров.
+    При drop_frames=True, если обработка не успевает, самые старые кадры выбрасываются
+    (режим реального времени), иначе чтение ждет обработку (без потерь, для файлов).
+    pace_fps > 0 ограничивает скорость чтения, чтобы локальный файл вел себя как живая камера
+    """
+
+    def __init__(self, capture, queue_size=8, drop_frames=False, pace_fps=0.0):
+        self.capture = capture
+        self.pace_fps = pace_fps
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.drop_frames = drop_frames
+        self.read_count = 0
+        self.dropped = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        # Освобождаем место, чтобы поток чтения не завис на put()
+        while not self.queue.empty():
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        self.thread.join(timeout=5)
+
+    def _run(self):
+        start = time.perf_counter()
+        while not self.stopped.is_set():
+            if self.pace_fps > 0:
+                delay = start + self.read_count / self.pace_fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            ok, frame = self.capture.read()
+            if not ok:
+                break
+            self.read_count += 1
+            item = (self.read_count - 1, time.perf_counter(), frame)
+
+            if self.drop_frames:
+                while True:
+                    try:
+                        self.queue.put_nowait(item)
+                        break
+                    except queue.Full:
+                        try:
+                            self.queue.get_nowait()
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+            else:
+                while not self.stopped.is_set():
+                    try:
+                        self.queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+
+        # Маркер конца потока; после stop() место освобождается принудительно
+        while True:
+            try:
+                self.queue.put(None, timeout=0.1)
+                return
+            except queue.Full:
+                if self.stopped.is_set() or self.drop_frames:
+                    try:
+                        self.queue.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def __iter__(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            yield item